@@ -115,6 +115,18 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# Rendered quotation PDFs, evicted least recently used first beyond the size limit
+QUOTATION_PDF_CACHE_DIR = BASE_DIR / 'pdf_cache'
+QUOTATION_PDF_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+# Maximum number of quotations rendered by one batch PDF request
+QUOTATION_PDF_BATCH_LIMIT = 100
+
+# PDF rendering pool (see ledger/pdf_workers.py); 0 processes renders inside the web worker
+PDF_WORKER_PROCESSES = int(os.environ.get('PDF_WORKER_PROCESSES', 2))
+PDF_WORKER_MAX_JOBS = 50
+PDF_WORKER_TIMEOUT = 60
+
 
 
 # REST Framework configuration
@@ -170,3 +182,6 @@ CORS_ALLOW_HEADERS = [
     'x-requested-with',
 ]
 CORS_ALLOW_ALL_ORIGINS = True
+
+# Days between placing a purchase and receiving it, used by MRP planning (ledger/planning.py)
+MRP_LEAD_TIME_DAYS = 7
@@ -125,7 +125,7 @@ class TaxAdmin(admin.ModelAdmin):
 @admin.register(InventoryItem)
 class InventoryItemAdmin(admin.ModelAdmin):
     list_display = ('name', 'unit_price', 'unit', 'base_unit', 'category', 'stock_quantity', 'min_stock_level', 'sku')
-    list_filter = ('category', 'created_at', 'base_unit')
+    list_filter = ('category', 'below_reorder', 'created_at', 'base_unit')
     search_fields = ('name', 'description', 'sku', 'category')
     readonly_fields = ('created_at', 'updated_at')
     fieldsets = (
@@ -0,0 +1,160 @@
+"""
+Quotation pipeline analytics.
+
+QuotationMonthlyStat keeps one row per (month, status, company) with the number and total
+value of live quotations. The quotation signals apply the difference whenever a quotation
+is created or deleted, or changes date, status, company or total. The analytics endpoint
+therefore only reads rollup rows, however many quotations exist.
+`manage.py rebuild_quotation_stats` recomputes the table from the quotations.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Q, Sum, Count
+from django.db.models.functions import TruncMonth
+
+from .models import Quotation, QuotationMonthlyStat
+
+# Fields that decide which rollup row a quotation counts towards, and by how much
+TRACKED_FIELDS = ('quotation_date', 'status', 'company_id', 'total_amount', 'deleted')
+
+# Quotations in these states have been decided; acceptance rate is accepted / decided
+DECIDED_STATUSES = ('accepted', 'rejected', 'expired')
+
+
+def rollup_key(values):
+    """(month, status, company_id) a quotation is counted under, None if it is not counted"""
+    if values['deleted'] or not values['quotation_date']:
+        return None
+    return values['quotation_date'].replace(day=1), values['status'], values['company_id']
+
+
+def apply_delta(key, count, amount):
+    month, status, company_id = key
+    rows = QuotationMonthlyStat.objects.filter(month=month, status=status, company_id=company_id)
+    changes = {'count': F('count') + count, 'total_amount': F('total_amount') + amount}
+    if not rows.update(**changes):
+        QuotationMonthlyStat.objects.get_or_create(month=month, status=status, company_id=company_id)
+        rows.update(**changes)
+
+
+def record_change(quotation, created):
+    """Move a saved quotation's contribution from its old rollup row to its new one"""
+    new = {field: getattr(quotation, field) for field in TRACKED_FIELDS}
+    old = None if created else {field: quotation.loaded_value(field, new[field]) for field in TRACKED_FIELDS}
+
+    old_key = rollup_key(old) if old else None
+    new_key = rollup_key(new)
+    if old_key != new_key or (old and old['total_amount'] != new['total_amount']):
+        with transaction.atomic():
+            if old_key:
+                apply_delta(old_key, -1, -old['total_amount'])
+            if new_key:
+                apply_delta(new_key, 1, new['total_amount'])
+
+    # The instance may be saved again; later deltas start from what was just recorded
+    if getattr(quotation, '_loaded_values', None) is None:
+        quotation._loaded_values = {}
+    quotation._loaded_values.update(new)
+
+
+def record_removal(quotation):
+    """Take a hard-deleted quotation out of the rollup"""
+    values = {field: quotation.loaded_value(field, getattr(quotation, field)) for field in TRACKED_FIELDS}
+    key = rollup_key(values)
+    if key:
+        apply_delta(key, -1, -values['total_amount'])
+
+
+def rebuild():
+    """Recompute the rollup table from the quotations"""
+    rows = Quotation.objects.annotate(month=TruncMonth('quotation_date'))\
+        .values('month', 'status', 'company_id')\
+        .annotate(count=Count('id'), total=Sum('total_amount'))\
+        .order_by()
+    stats = [
+        QuotationMonthlyStat(
+            month=row['month'], status=row['status'], company_id=row['company_id'],
+            count=row['count'], total_amount=row['total'] or Decimal('0.00')
+        )
+        for row in rows
+    ]
+    with transaction.atomic():
+        QuotationMonthlyStat.objects.all().delete()
+        QuotationMonthlyStat.objects.bulk_create(stats)
+    return len(stats)
+
+
+def live_rows():
+    """Quotations shaped like the rollup, to compute the same figures straight from the source"""
+    return Quotation.objects.annotate(month=TruncMonth('quotation_date')), lambda **kwargs: Count('id', **kwargs)
+
+
+def rollup_rows():
+    return QuotationMonthlyStat.objects.all(), lambda **kwargs: Sum('count', **kwargs)
+
+
+def value(**kwargs):
+    # Both the quotations and the rollup keep the amount in total_amount
+    return Sum('total_amount', **kwargs)
+
+
+def status_aggregates(count):
+    """Conditional aggregates giving count and value for every status in one pass"""
+    aggregates = {'total_count': count(), 'total_value': value()}
+    for status, _ in Quotation.STATUS_CHOICES:
+        aggregates[f'{status}_count'] = count(filter=Q(status=status))
+        aggregates[f'{status}_value'] = value(filter=Q(status=status))
+    return aggregates
+
+
+def shape(row):
+    return {
+        'count': row['total_count'] or 0,
+        'value': str(row['total_value'] or Decimal('0.00')),
+        'by_status': {
+            status: {
+                'count': row[f'{status}_count'] or 0,
+                'value': str(row[f'{status}_value'] or Decimal('0.00')),
+            }
+            for status, _ in Quotation.STATUS_CHOICES
+        },
+    }
+
+
+def pipeline(start_month=None, end_month=None, company_id=None, top=10, live=False):
+    """Quoted value by month and status, acceptance rate and top customers"""
+    rows, count = live_rows() if live else rollup_rows()
+    if start_month:
+        rows = rows.filter(month__gte=start_month)
+    if end_month:
+        rows = rows.filter(month__lte=end_month)
+    if company_id:
+        rows = rows.filter(company_id=company_id)
+
+    aggregates = status_aggregates(count)
+    months = rows.values('month').annotate(**aggregates).order_by('month')
+    totals = rows.aggregate(**aggregates)
+
+    decided = sum(totals[f'{status}_count'] or 0 for status in DECIDED_STATUSES)
+    accepted = totals['accepted_count'] or 0
+
+    customers = rows.values('company_id', 'company__name').annotate(
+        total_count=count(), total_value=value(), accepted_value=value(filter=Q(status='accepted'))
+    ).order_by('-total_value')[:top]
+
+    return {
+        'months': [{'month': row['month'].strftime('%Y-%m'), **shape(row)} for row in months],
+        'totals': shape(totals),
+        'acceptance_rate': round(accepted * 100 / decided, 2) if decided else None,
+        'top_customers': [
+            {
+                'company': row['company_id'],
+                'company_name': row['company__name'],
+                'count': row['total_count'],
+                'value': str(row['total_value'] or Decimal('0.00')),
+                'accepted_value': str(row['accepted_value'] or Decimal('0.00')),
+            }
+            for row in customers
+        ],
+    }
@@ -7,3 +7,9 @@ class LedgerConfig(AppConfig):
 
     def ready(self):
         import ledger.signals  # noqa
+        from ledger import pdf_workers
+        from ledger.expiry import start_scheduler
+
+        # PDF pool processes run django.setup() too; background work belongs to the parent only
+        if not pdf_workers.is_worker():
+            start_scheduler()
@@ -0,0 +1,85 @@
+"""
+In-memory prefix indexes for typeahead over item, company and machine names.
+
+Each worker builds an index lazily on the first lookup and keeps it until the model's
+version counter (bumped after commit by the signals in signals.py when a name changes)
+moves on. The counter is a database row shared by all workers. A keystroke costs one
+indexed counter read plus a binary search into a sorted key list.
+"""
+import threading
+from bisect import bisect_left
+
+from .model_versions import get_version
+from .models import InventoryItem, Company, Machine
+
+
+AUTOCOMPLETE_SOURCES = {
+    'item': InventoryItem,
+    'company': Company,
+    'machine': Machine,
+}
+
+
+def normalize(text):
+    return ' '.join(text.lower().split())
+
+
+class PrefixIndex:
+    """Sorted (key, id) pairs where every word of a name starts a key"""
+
+    def __init__(self, rows):
+        entries = []
+        self.names = {}
+        for pk, name in rows:
+            self.names[pk] = name
+            words = normalize(name).split(' ')
+            for start in range(len(words)):
+                entries.append((' '.join(words[start:]), pk))
+        entries.sort()
+        self.keys = [key for key, pk in entries]
+        self.ids = [pk for key, pk in entries]
+
+    def lookup(self, prefix, limit=10):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        results = []
+        seen = set()
+        position = bisect_left(self.keys, prefix)
+        while position < len(self.keys) and self.keys[position].startswith(prefix):
+            pk = self.ids[position]
+            if pk not in seen:
+                seen.add(pk)
+                results.append({'id': pk, 'name': self.names[pk]})
+                if len(results) >= limit:
+                    break
+            position += 1
+        return results
+
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def version_name(model):
+    return f'autocomplete:{model._meta.model_name}'
+
+
+def get_index(source):
+    model = AUTOCOMPLETE_SOURCES[source]
+    version = get_version(version_name(model))
+    cached = _indexes.get(source)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    with _lock:
+        cached = _indexes.get(source)
+        if cached and cached[0] == version:
+            return cached[1]
+        index = PrefixIndex(model.objects.values_list('id', 'name').iterator())
+        _indexes[source] = (version, index)
+        return index
+
+
+def autocomplete(source, query, limit=10):
+    return get_index(source).lookup(query, limit)
@@ -0,0 +1,153 @@
+"""
+Multi-level bill of materials explosion.
+
+A MachineRequirement consumes either an inventory item or a component machine, a
+sub-assembly with requirements of its own. Exploding a machine flattens its tree into
+{inventory_item_id: quantity per unit}. Each machine is flattened once per BomExplosion and
+reused wherever it appears again, so shared sub-assemblies are not walked twice and the
+work is linear in the number of BOM lines.
+
+BomMatrix holds the flattened rows of every machine: a sparse machine x item matrix built
+from one query and cached per process. The cache is keyed on the 'bom' ModelVersion row,
+which every BOM edit bumps after commit, so all workers rebuild on their next use.
+A demand vector of machine quantities multiplies against it in exact Decimal arithmetic.
+"""
+import threading
+
+from .model_versions import get_version, bump_version_on_commit
+from .models import MachineRequirement
+
+BOM_VERSION = 'bom'
+
+
+class BomCycleError(ValueError):
+    """A machine contains itself, directly or through its components"""
+
+    def __init__(self, path):
+        self.path = path
+        super().__init__('BOM cycle between machines: ' + ' -> '.join(str(machine_id) for machine_id in path))
+
+
+def load_requirements(machine_ids):
+    """
+    {machine_id: [(inventory_item_id, component_machine_id, quantity)]} for the machines and
+    every component below them, one BOM level per query
+    """
+    requirements = {}
+    pending = set(machine_ids)
+    while pending:
+        for machine_id in pending:
+            requirements[machine_id] = []
+        rows = MachineRequirement.objects.filter(machine_id__in=pending).values_list(
+            'machine_id', 'inventory_item_id', 'component_machine_id', 'quantity'
+        )
+        components = set()
+        for machine_id, item_id, component_id, quantity in rows:
+            requirements[machine_id].append((item_id, component_id, quantity))
+            if component_id is not None:
+                components.add(component_id)
+        pending = components - requirements.keys()
+    return requirements
+
+
+class BomExplosion:
+    """Flattens machines into raw material quantities, memoizing every sub-assembly"""
+
+    def __init__(self, requirements):
+        self.requirements = requirements
+        self.flattened = {}
+        self._path = []
+        self._visiting = set()
+
+    def explode(self, machine_id):
+        """{inventory_item_id: quantity} needed for one unit of the machine"""
+        flattened = self.flattened.get(machine_id)
+        if flattened is not None:
+            return flattened
+        if machine_id in self._visiting:
+            raise BomCycleError(self._path[self._path.index(machine_id):] + [machine_id])
+
+        self._visiting.add(machine_id)
+        self._path.append(machine_id)
+        totals = {}
+        try:
+            for item_id, component_id, quantity in self.requirements.get(machine_id, ()):
+                if component_id is None:
+                    totals[item_id] = totals.get(item_id, 0) + quantity
+                else:
+                    for sub_item_id, sub_quantity in self.explode(component_id).items():
+                        totals[sub_item_id] = totals.get(sub_item_id, 0) + quantity * sub_quantity
+        finally:
+            self._path.pop()
+            self._visiting.discard(machine_id)
+
+        self.flattened[machine_id] = totals
+        return totals
+
+
+def creates_cycle(machine_id, component_id):
+    """True if making component_id a component of machine_id would make the machine contain itself"""
+    return machine_id == component_id or machine_id in load_requirements([component_id])
+
+
+class BomMatrix:
+    """Sparse machine x item requirement matrix with every sub-assembly flattened"""
+
+    def __init__(self, requirements):
+        explosion = BomExplosion(requirements)
+        self.rows = {}
+        self.cycles = {}
+        for machine_id in requirements:
+            try:
+                self.rows[machine_id] = explosion.explode(machine_id)
+            except BomCycleError as exc:
+                # Only the machines on or above the cycle are unusable
+                self.cycles[machine_id] = exc.path
+
+    @classmethod
+    def build(cls):
+        requirements = {}
+        for machine_id, item_id, component_id, quantity in MachineRequirement.objects.values_list(
+            'machine_id', 'inventory_item_id', 'component_machine_id', 'quantity'
+        ).iterator():
+            requirements.setdefault(machine_id, []).append((item_id, component_id, quantity))
+        return cls(requirements)
+
+    def row(self, machine_id):
+        """{inventory_item_id: quantity} for one unit of the machine"""
+        if machine_id in self.cycles:
+            raise BomCycleError(self.cycles[machine_id])
+        return self.rows.get(machine_id, {})
+
+    def multiply(self, orders):
+        """{inventory_item_id: quantity} for an iterable of (machine_id, quantity) orders"""
+        totals = {}
+        for machine_id, order_quantity in orders:
+            for item_id, quantity in self.row(machine_id).items():
+                totals[item_id] = totals.get(item_id, 0) + quantity * order_quantity
+        return totals
+
+
+_matrix = None
+_lock = threading.Lock()
+
+
+def get_bom_matrix():
+    """The process-wide BOM matrix, rebuilt after any BOM edit"""
+    global _matrix
+    version = get_version(BOM_VERSION)
+    cached = _matrix
+    if cached and cached[0] == version:
+        return cached[1]
+
+    with _lock:
+        cached = _matrix
+        if cached and cached[0] == version:
+            return cached[1]
+        matrix = BomMatrix.build()
+        _matrix = (version, matrix)
+        return matrix
+
+
+def invalidate_bom_matrix():
+    bump_version_on_commit(BOM_VERSION)
@@ -0,0 +1,138 @@
+"""
+Keeps draft demands in step with BOM edits.
+
+Saving or deleting a MachineRequirement changes the flattened requirements of its machine
+and of every machine that contains it as a sub-assembly. Rather than re-exploding demands,
+the edit is turned into a per-item delta for one unit of the machine. Every draft demand that
+orders the machine, directly or through a parent machine, gets delta x ordered units added to
+its DemandMaterial rows: one UPDATE per affected item, a bulk insert for items the demand did
+not need before and a delete for rows that drop to zero. Finalized demands are never touched.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Value, When
+
+from .bom import BomCycleError, BomExplosion, load_requirements
+from .models import DemandMachineOrder, DemandMaterial, MachineRequirement
+
+TRACKED_FIELDS = ('machine_id', 'inventory_item_id', 'component_machine_id', 'quantity')
+
+QUANTUM = Decimal('0.0001')
+
+
+def line_requirements(item_id, component_id, quantity):
+    """{inventory_item_id: quantity} that one BOM line adds to one unit of its machine"""
+    if component_id is None:
+        return {item_id: quantity}
+    flattened = BomExplosion(load_requirements([component_id])).explode(component_id)
+    return {sub_item_id: sub_quantity * quantity for sub_item_id, sub_quantity in flattened.items()}
+
+
+def where_used(machine_id):
+    """{machine_id: units of the given machine in one unit of it} for the machine and every machine containing it"""
+    edges = {}
+    found = {machine_id}
+    pending = {machine_id}
+    while pending:
+        rows = MachineRequirement.objects.filter(component_machine_id__in=pending)\
+            .values_list('machine_id', 'component_machine_id', 'quantity')
+        pending = set()
+        for parent_id, component_id, quantity in rows:
+            edges.setdefault(parent_id, []).append((component_id, quantity))
+            if parent_id not in found:
+                found.add(parent_id)
+                pending.add(parent_id)
+
+    units = {machine_id: 1}
+
+    def units_in(parent_id):
+        if parent_id not in units:
+            units[parent_id] = None
+            units[parent_id] = sum(quantity * units_in(component_id) for component_id, quantity in edges[parent_id])
+        elif units[parent_id] is None:
+            raise BomCycleError([parent_id])
+        return units[parent_id]
+
+    for parent_id in found:
+        units_in(parent_id)
+    return units
+
+
+def apply_delta(machine_id, delta):
+    """Add delta ({inventory_item_id: quantity per unit of the machine}) to the draft demands using it"""
+    delta = {item_id: quantity for item_id, quantity in delta.items() if quantity}
+    if not delta:
+        return 0
+
+    units = where_used(machine_id)
+    ordered = {}
+    for demand_id, ordered_machine_id, quantity in DemandMachineOrder.objects.filter(
+        machine_id__in=list(units), demand__status='draft', demand__deleted=False
+    ).values_list('demand_id', 'machine_id', 'quantity'):
+        ordered[demand_id] = ordered.get(demand_id, 0) + quantity * units[ordered_machine_id]
+    if not ordered:
+        return 0
+
+    demand_ids = list(ordered)
+    materials = DemandMaterial.objects.filter(demand_id__in=demand_ids, inventory_item_id__in=list(delta))
+    existing = set(materials.values_list('demand_id', 'inventory_item_id'))
+
+    new_rows = []
+    for item_id, quantity in delta.items():
+        changes = {}
+        for demand_id, demand_units in ordered.items():
+            change = (demand_units * quantity).quantize(QUANTUM)
+            if not change:
+                continue
+            if (demand_id, item_id) in existing:
+                changes[demand_id] = change
+            elif change > 0:
+                new_rows.append(DemandMaterial(demand_id=demand_id, inventory_item_id=item_id, quantity=change))
+        if changes:
+            DemandMaterial.objects.filter(demand_id__in=list(changes), inventory_item_id=item_id).update(
+                quantity=F('quantity') + Case(
+                    *[When(demand_id=demand_id, then=Value(change)) for demand_id, change in changes.items()],
+                    output_field=DecimalField(max_digits=15, decimal_places=4)
+                )
+            )
+
+    DemandMaterial.objects.bulk_create(new_rows)
+    # A requirement that no longer applies leaves nothing behind
+    materials.filter(quantity__lte=0).delete()
+    return len(ordered)
+
+
+def record_change(requirement, created):
+    """Apply a saved requirement's effect on draft demands"""
+    new = {field: getattr(requirement, field) for field in TRACKED_FIELDS}
+    old = None if created else {field: requirement.loaded_value(field, new[field]) for field in TRACKED_FIELDS}
+
+    if old != new:
+        new_line = line_requirements(new['inventory_item_id'], new['component_machine_id'], new['quantity'])
+        with transaction.atomic():
+            if old is None:
+                apply_delta(new['machine_id'], new_line)
+            else:
+                old_line = line_requirements(old['inventory_item_id'], old['component_machine_id'], old['quantity'])
+                if old['machine_id'] == new['machine_id']:
+                    delta = dict(new_line)
+                    for item_id, quantity in old_line.items():
+                        delta[item_id] = delta.get(item_id, 0) - quantity
+                    apply_delta(new['machine_id'], delta)
+                else:
+                    apply_delta(old['machine_id'], {item_id: -quantity for item_id, quantity in old_line.items()})
+                    apply_delta(new['machine_id'], new_line)
+
+    # The instance may be saved again; later deltas start from what was just applied
+    if getattr(requirement, '_loaded_values', None) is None:
+        requirement._loaded_values = {}
+    requirement._loaded_values.update(new)
+
+
+def record_removal(requirement):
+    """Take a deleted requirement out of draft demands"""
+    values = {field: requirement.loaded_value(field, getattr(requirement, field)) for field in TRACKED_FIELDS}
+    line = line_requirements(values['inventory_item_id'], values['component_machine_id'], values['quantity'])
+    with transaction.atomic():
+        apply_delta(values['machine_id'], {item_id: -quantity for item_id, quantity in line.items()})
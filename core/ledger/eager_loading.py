@@ -0,0 +1,150 @@
+"""
+Derive select_related / prefetch_related / only() from a serializer's field sources.
+
+`EagerLoadingMixin` inspects the viewset's serializer, follows dotted sources such as
+ReadOnlyField(source='company.name') and nested serializers through the model
+relations, and applies the matching joins and prefetches so list and detail endpoints
+run a constant number of queries per page. On read requests it also prunes the
+columns loaded for related models with only().
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.relations import ManyRelatedField
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+# Marker for "something may read any attribute of this model"
+ALL_FIELDS = None
+
+
+def get_model_field(model, name):
+    """Model field (or reverse relation) for an attribute name, None for properties and methods"""
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        for relation in model._meta.related_objects:
+            if relation.get_accessor_name() == name:
+                return relation
+    return None
+
+
+class QueryPlan:
+    """Relations to join or prefetch, and columns to load, for one model's queryset"""
+
+    def __init__(self, model):
+        self.model = model
+        self.select = set()
+        self.prefetch = {}
+        self.fields = {'': set()}
+        self.models = {'': model}
+
+    def use(self, path, name):
+        if self.fields.setdefault(path, set()) is not ALL_FIELDS:
+            self.fields[path].add(name)
+
+    def use_all(self, path):
+        self.fields[path] = ALL_FIELDS
+
+    def add_serializer(self, serializer, path=''):
+        model = self.models[path]
+        for field in serializer.fields.values():
+            if field.write_only:
+                continue
+            if field.source == '*':
+                # SerializerMethodField and friends can read anything on the object
+                self.use_all(path)
+                if isinstance(field, BaseSerializer):
+                    self.add_serializer(field, path)
+                continue
+            self.add_source(field, field.source_attrs, model, path)
+
+    def add_source(self, field, attrs, model, path):
+        for position, attr in enumerate(attrs):
+            last = position == len(attrs) - 1
+            model_field = get_model_field(model, attr)
+
+            if model_field is None:
+                if not hasattr(model, attr):
+                    # A queryset annotation, loaded whatever only() says
+                    return
+                # A property or method: it may touch any column
+                self.use_all(path)
+                return
+            if not model_field.is_relation:
+                self.use(path, attr)
+                return
+
+            lookup = f'{path}__{attr}' if path else attr
+            if model_field.one_to_many or model_field.many_to_many:
+                child = self.prefetch.setdefault(lookup, QueryPlan(model_field.related_model))
+                if model_field.one_to_many:
+                    # The child rows need their foreign key back to us to be matched up
+                    child.use('', model_field.field.name)
+                if last and isinstance(field, ListSerializer):
+                    child.add_serializer(field.child)
+                return
+
+            if model_field.concrete:
+                self.use(path, attr)
+            if last and not isinstance(field, BaseSerializer):
+                # Primary key related fields only need the foreign key column
+                return
+
+            self.select.add(lookup)
+            self.fields.setdefault(lookup, set())
+            self.models[lookup] = model_field.related_model
+            model, path = model_field.related_model, lookup
+
+        if isinstance(field, BaseSerializer) and not isinstance(field, (ListSerializer, ManyRelatedField)):
+            self.add_serializer(field, path)
+
+    def only_fields(self):
+        if all(names is ALL_FIELDS for names in self.fields.values()):
+            return None
+        only = []
+        for path, names in self.fields.items():
+            model = self.models[path]
+            if names is ALL_FIELDS:
+                names = {field.name for field in model._meta.concrete_fields}
+            else:
+                names = {model._meta.pk.name, *names}
+            prefix = f'{path}__' if path else ''
+            only.extend(f'{prefix}{name}' for name in sorted(names))
+        return only
+
+    def apply(self, queryset, prune=False):
+        if self.select:
+            queryset = queryset.select_related(*sorted(self.select))
+        if self.prefetch:
+            queryset = queryset.prefetch_related(*[
+                Prefetch(lookup, queryset=child.apply(child.model._default_manager.all(), prune))
+                for lookup, child in self.prefetch.items()
+            ])
+        if prune:
+            only = self.only_fields()
+            if only:
+                queryset = queryset.only(*only)
+        return queryset
+
+
+_plans = {}
+
+
+def get_query_plan(serializer, model):
+    key = (type(serializer), model, tuple(serializer.fields))
+    if key not in _plans:
+        plan = QueryPlan(model)
+        plan.add_serializer(serializer)
+        _plans[key] = plan
+    return _plans[key]
+
+
+class EagerLoadingMixin:
+    """ViewSet mixin that eager-loads whatever the serializer is going to read"""
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        serializer = self.get_serializer()
+        plan = get_query_plan(serializer, queryset.model)
+        # Column pruning is only safe when the instances are not going to be saved
+        return plan.apply(queryset, prune=self.request.method in SAFE_METHODS)
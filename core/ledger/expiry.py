@@ -0,0 +1,85 @@
+"""
+Expiry of overdue quotations.
+
+Draft and sent quotations whose valid_until date has passed are flipped to 'expired' with a
+single UPDATE on the (status, valid_until) index. The UPDATE bypasses the quotation
+signals, so the monthly rollup is adjusted here from one grouped query over the same rows.
+Run it with `manage.py expire_quotations` from cron, or keep one
+`manage.py expire_quotations --every SECONDS` process running. Alternatively, set the
+QUOTATION_EXPIRY_SCHEDULER environment variable (seconds) on exactly one single-process
+service to sweep from a background thread there; it is never started otherwise, nor in
+PDF pool processes.
+"""
+import os
+import threading
+import time
+
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .analytics import apply_delta
+from .models import Quotation
+
+EXPIRABLE_STATUSES = ('draft', 'sent')
+
+
+def overdue_quotations(today=None):
+    today = today or timezone.localdate()
+    return Quotation.objects.filter(status__in=EXPIRABLE_STATUSES, valid_until__lt=today)
+
+
+def expire_overdue_quotations(today=None, dry_run=False):
+    """Expire every overdue draft/sent quotation; returns the number expired per previous status"""
+    overdue = overdue_quotations(today)
+
+    with transaction.atomic():
+        # Lock the rows so the rollup deltas and the UPDATE see the same quotations
+        list(overdue.select_for_update().values_list('pk', flat=True))
+
+        groups = list(
+            overdue.annotate(month=TruncMonth('quotation_date'))
+            .values('month', 'status', 'company_id')
+            .annotate(count=Count('id'), total=Sum('total_amount'))
+            .order_by()
+        )
+        counts = {}
+        for group in groups:
+            counts[group['status']] = counts.get(group['status'], 0) + group['count']
+
+        if dry_run or not groups:
+            return counts
+
+        overdue.update(status='expired', updated_at=timezone.now())
+
+        for group in groups:
+            apply_delta((group['month'], group['status'], group['company_id']), -group['count'], -group['total'])
+            apply_delta((group['month'], 'expired', group['company_id']), group['count'], group['total'])
+
+    return counts
+
+
+def run_periodically(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            expire_overdue_quotations()
+        except Exception:
+            # Keep sweeping; a failed run (e.g. database briefly unavailable) is retried next interval
+            pass
+        finally:
+            connection.close()
+
+
+SCHEDULER_ENV_VAR = 'QUOTATION_EXPIRY_SCHEDULER'
+
+
+def start_scheduler():
+    """Start the background sweeper in this process if QUOTATION_EXPIRY_SCHEDULER is set"""
+    try:
+        interval = int(os.environ.get(SCHEDULER_ENV_VAR, 0))
+    except ValueError:
+        interval = 0
+    if interval > 0:
+        threading.Thread(target=run_periodically, args=(interval,), daemon=True, name='quotation-expiry').start()
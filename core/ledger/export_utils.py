@@ -4,18 +4,17 @@ from datetime import datetime
 from decimal import Decimal
 from io import BytesIO
 
-from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
+from reportlab.platypus import SimpleDocTemplate, Table, Paragraph, Spacer, PageBreak
 
 from openpyxl import Workbook
 from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
 from openpyxl.utils import get_column_letter
 
+from . import pdf_workers
 from .models import Company, LedgerEntry
+from .pdf_templates import get_ledger_template
 
 
 def calculate_ledger_data(company, start_date=None, end_date=None):
@@ -109,40 +108,42 @@ def export_ledger_pdf(company, start_date=None, end_date=None):
     """Export company ledger as PDF"""
     data = calculate_ledger_data(company, start_date, end_date)
 
+    # Render in the PDF worker pool from plain data
+    data['company'] = {
+        'name': company.name,
+        'email': company.email,
+        'phone': company.phone,
+        'address': company.address,
+    }
+    pdf = pdf_workers.render(render_ledger_pdf, data)
+
+    # Create HTTP response
+    filename = f"ledger_{company.name.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.pdf"
+    response = HttpResponse(pdf, content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def render_ledger_pdf(data):
+    """Render ledger data (with the company as a plain dict) to PDF bytes"""
     # Create PDF buffer
     buffer = BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4)
     elements = []
 
-    # Styles
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        textColor=colors.HexColor('#1a237e'),
-        spaceAfter=30,
-        alignment=TA_CENTER
-    )
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=14,
-        textColor=colors.HexColor('#283593'),
-        spaceAfter=12
-    )
-    normal_style = styles['Normal']
+    # Styles are shared by every ledger PDF in this process
+    template = get_ledger_template()
 
     # Title
-    elements.append(Paragraph("COMPANY LEDGER", title_style))
+    elements.append(Paragraph("COMPANY LEDGER", template.title_style))
     elements.append(Spacer(1, 0.2 * inch))
 
     # Company Information
     company_info = [
-        ['Company Name:', data['company'].name],
-        ['Email:', data['company'].email or 'N/A'],
-        ['Phone:', data['company'].phone or 'N/A'],
-        ['Address:', data['company'].address or 'N/A'],
+        ['Company Name:', data['company']['name']],
+        ['Email:', data['company']['email'] or 'N/A'],
+        ['Phone:', data['company']['phone'] or 'N/A'],
+        ['Address:', data['company']['address'] or 'N/A'],
     ]
 
     if data['start_date'] or data['end_date']:
@@ -154,18 +155,7 @@ def export_ledger_pdf(company, start_date=None, end_date=None):
         company_info.append(['Date Range:', ' - '.join(date_range)])
 
     company_table = Table(company_info, colWidths=[2 * inch, 4 * inch])
-    company_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#e3f2fd')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-    ]))
+    company_table.setStyle(template.company_table_style)
     elements.append(company_table)
     elements.append(Spacer(1, 0.3 * inch))
 
@@ -177,23 +167,13 @@ def export_ledger_pdf(company, start_date=None, end_date=None):
         ['Closing Balance', f"₹ {data['closing_balance']:,.2f}"],
     ]
     summary_table = Table(summary_data, colWidths=[3 * inch, 3 * inch])
-    summary_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), colors.white),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 11),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
-        ('TOPPADDING', (0, 0), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-    ]))
+    summary_table.setStyle(template.summary_table_style)
     elements.append(summary_table)
     elements.append(Spacer(1, 0.3 * inch))
 
     # Ledger Entries
     if data['entries']:
-        elements.append(Paragraph("Transaction Details", heading_style))
+        elements.append(Paragraph("Transaction Details", template.heading_style))
         
         # Table header
         table_data = [['Date', 'Reference', 'Description', 'Debit', 'Credit', 'Balance']]
@@ -213,38 +193,14 @@ def export_ledger_pdf(company, start_date=None, end_date=None):
 
         # Create table
         ledger_table = Table(table_data, colWidths=[0.8 * inch, 1.2 * inch, 2 * inch, 1 * inch, 1 * inch, 1 * inch])
-        ledger_table.setStyle(TableStyle([
-            # Header row
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1a237e')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('ALIGN', (3, 1), (-1, -1), 'RIGHT'),  # Right align amounts
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('TOPPADDING', (0, 0), (-1, 0), 12),
-            # Data rows
-            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 9),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f5f5f5')]),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
+        ledger_table.setStyle(template.ledger_table_style)
         elements.append(ledger_table)
     else:
-        elements.append(Paragraph("No transactions found for the selected period.", normal_style))
+        elements.append(Paragraph("No transactions found for the selected period.", template.normal_style))
 
     # Build PDF
     doc.build(elements)
-    buffer.seek(0)
-
-    # Create HTTP response
-    filename = f"ledger_{company.name.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.pdf"
-    response = HttpResponse(buffer.read(), content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    return response
+    return buffer.getvalue()
 
 
 def export_ledger_excel(company, start_date=None, end_date=None):
@@ -0,0 +1,34 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from ledger.expiry import expire_overdue_quotations, run_periodically
+
+
+class Command(BaseCommand):
+    help = 'Marks draft and sent quotations whose valid_until date has passed as expired'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Treat this day (YYYY-MM-DD) as today')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be expired')
+        parser.add_argument('--every', type=int, help='Keep running, sweeping every this many seconds')
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            try:
+                today = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--date must be YYYY-MM-DD')
+
+        if options['every'] is not None:
+            if options['every'] <= 0 or today or options['dry_run']:
+                raise CommandError('--every takes a positive number of seconds and no --date or --dry-run')
+            self.stdout.write(f"Expiring overdue quotations every {options['every']} seconds")
+            run_periodically(options['every'])
+            return
+
+        counts = expire_overdue_quotations(today, dry_run=options['dry_run'])
+        total = sum(counts.values())
+        details = ', '.join(f'{count} {status}' for status, count in sorted(counts.items()))
+        verb = 'Would expire' if options['dry_run'] else 'Expired'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {total} quotations' + (f' ({details})' if details else '')))
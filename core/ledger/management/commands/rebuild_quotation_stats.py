@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from ledger import analytics
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the monthly quotation rollup used by the quotation analytics endpoint'
+
+    def handle(self, *args, **options):
+        rows = analytics.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt quotation stats: {rows} rows'))
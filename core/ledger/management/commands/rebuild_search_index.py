@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from ledger.search import SEARCH_INDEXES
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search indexes for inventory items and companies'
+
+    def handle(self, *args, **options):
+        for index in SEARCH_INDEXES:
+            if not index.is_supported():
+                self.stdout.write(f'Skipping {index.table}: full-text index not used on this database backend')
+                continue
+            index.rebuild()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {index.table}'))
@@ -0,0 +1,25 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from ledger.planning import run_mrp
+
+
+class Command(BaseCommand):
+    help = 'Plans material purchases for all open demands and replaces the planned orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Plan as of this day (YYYY-MM-DD) instead of today')
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            try:
+                today = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--date must be YYYY-MM-DD')
+
+        result = run_mrp(today)
+        self.stdout.write(self.style.SUCCESS(
+            f"Planned {result['planned_orders']} orders for {result['items']} items "
+            f"(replaced {result['replaced_orders']})"
+        ))
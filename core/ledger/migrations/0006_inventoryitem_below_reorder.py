@@ -0,0 +1,50 @@
+# Generated by Django 6.0.1 on 2026-10-19 05:00
+
+import django.core.validators
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+from django.utils import timezone
+
+
+def flag_items_below_reorder(apps, schema_editor):
+    InventoryItem = apps.get_model('ledger', 'InventoryItem')
+    InventoryItem.objects.filter(
+        reorder_level__gt=0, stock_quantity__lte=F('reorder_level')
+    ).update(below_reorder=True, reorder_status_changed_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0005_demand_demandmaterial_machine_demandmachineorder_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='below_reorder',
+            field=models.BooleanField(default=False, editable=False, help_text='Stock is at or below the reorder level'),
+        ),
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='reorder_status_changed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='quotation',
+            name='ton',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Total weight in tons', max_digits=15, null=True, validators=[django.core.validators.MinValueValidator(Decimal('0.00'))]),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['below_reorder', 'name'], name='ledger_inve_below_r_979a03_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['reorder_status_changed_at'], name='ledger_inve_reorder_ff6da4_idx'),
+        ),
+        migrations.RunPython(flag_items_below_reorder, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 6.0.1 on 2026-10-19 05:01
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, F, Sum, When
+
+
+def backfill_batch_balances(apps, schema_editor):
+    Batch = apps.get_model('ledger', 'Batch')
+    StockTransaction = apps.get_model('ledger', 'StockTransaction')
+    totals = StockTransaction.objects.filter(batch__isnull=False).values('batch_id').annotate(
+        total=Sum(Case(
+            When(transaction_type='issue', then=-F('base_quantity')),
+            default=F('base_quantity'),
+        ))
+    )
+    for row in totals:
+        Batch.objects.filter(pk=row['batch_id']).update(balance=row['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0006_inventoryitem_below_reorder'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='batch',
+            name='balance',
+            field=models.DecimalField(decimal_places=4, default=Decimal('0.0000'), editable=False, help_text="Quantity on hand in the item's base unit, maintained by stock transactions", max_digits=15),
+        ),
+        migrations.AddIndex(
+            model_name='batch',
+            index=models.Index(condition=models.Q(('balance__gt', 0), ('deleted', False)), fields=['item', 'expiry_date'], name='batch_fefo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='batch',
+            index=models.Index(condition=models.Q(('balance__gt', 0), ('deleted', False)), fields=['expiry_date'], name='batch_expiry_idx'),
+        ),
+        migrations.RunPython(backfill_batch_balances, migrations.RunPython.noop),
+    ]
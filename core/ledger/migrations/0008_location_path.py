@@ -0,0 +1,43 @@
+# Generated by Django 6.0.1 on 2026-10-19 05:02
+
+from django.db import migrations, models
+
+
+def build_location_paths(apps, schema_editor):
+    Location = apps.get_model('ledger', 'Location')
+    children = {}
+    for pk, parent_id in Location.objects.values_list('id', 'parent_id'):
+        children.setdefault(parent_id, []).append(pk)
+
+    # Walk the tree from the roots; visited guards against pre-existing cycles
+    stack = [(pk, '/', 0) for pk in children.get(None, [])]
+    visited = set()
+    while stack:
+        pk, parent_path, depth = stack.pop()
+        if pk in visited:
+            continue
+        visited.add(pk)
+        path = f'{parent_path}{pk}/'
+        Location.objects.filter(pk=pk).update(path=path, depth=depth)
+        stack.extend((child, path, depth + 1) for child in children.get(pk, []))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0007_batch_balance_fefo_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='depth',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(build_location_paths, migrations.RunPython.noop),
+    ]
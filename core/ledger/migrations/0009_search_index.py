@@ -0,0 +1,43 @@
+# Generated by Django 6.0.1 on 2026-10-19 05:10
+
+from django.db import migrations
+
+
+SEARCH_TABLES = [
+    ('ledger_inventoryitem', ['name', 'sku', 'description', 'category']),
+    ('ledger_company', ['name', 'contact_person', 'email', 'gstin']),
+]
+
+
+def create_search_tables(apps, schema_editor):
+    # FTS5 is SQLite-only; other backends search with trigram/icontains instead
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for source, fields in SEARCH_TABLES:
+        columns = ', '.join(fields)
+        values = ', '.join(f"COALESCE({field}, '')" for field in fields)
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {source}_fts USING fts5("
+            f"{columns}, prefix='2 3', tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {source}_fts (rowid, {columns}) SELECT id, {values} FROM {source} WHERE NOT deleted"
+        )
+
+
+def drop_search_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for source, fields in SEARCH_TABLES:
+        schema_editor.execute(f"DROP TABLE IF EXISTS {source}_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0008_location_path'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_tables, drop_search_tables),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-19 05:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0010_document_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quotation',
+            name='invoice',
+            field=models.OneToOneField(blank=True, help_text='Invoice created from this quotation', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='quotation', to='ledger.invoice'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 6.0.1 on 2026-10-19 05:24
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def build_quotation_stats(apps, schema_editor):
+    Quotation = apps.get_model('ledger', 'Quotation')
+    QuotationMonthlyStat = apps.get_model('ledger', 'QuotationMonthlyStat')
+    rows = Quotation.objects.filter(deleted=False).annotate(month=TruncMonth('quotation_date'))\
+        .values('month', 'status', 'company_id')\
+        .annotate(count=Count('id'), total=Sum('total_amount'))\
+        .order_by()
+    QuotationMonthlyStat.objects.bulk_create([
+        QuotationMonthlyStat(
+            month=row['month'], status=row['status'], company_id=row['company_id'],
+            count=row['count'], total_amount=row['total'] or Decimal('0.00')
+        )
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0011_quotation_invoice'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuotationMonthlyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month of the quotation date')),
+                ('status', models.CharField(choices=[('draft', 'Draft'), ('sent', 'Sent'), ('accepted', 'Accepted'), ('rejected', 'Rejected'), ('expired', 'Expired')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=17)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quotation_stats', to='ledger.company')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['month', 'status'], name='ledger_quot_month_50063b_idx')],
+                'unique_together': {('month', 'status', 'company')},
+            },
+        ),
+        migrations.RunPython(build_quotation_stats, migrations.RunPython.noop),
+    ]
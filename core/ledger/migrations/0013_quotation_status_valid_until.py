@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-19 05:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0012_quotation_monthly_stat'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quotation',
+            index=models.Index(fields=['status', 'valid_until'], name='ledger_quot_status_9e0cd3_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 6.0.1 on 2026-10-19 05:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0013_quotation_status_valid_until'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='machinerequirement',
+            name='component_machine',
+            field=models.ForeignKey(blank=True, help_text='Sub-assembly machine, exploded into its own requirements', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='used_in', to='ledger.machine'),
+        ),
+        migrations.AlterField(
+            model_name='machinerequirement',
+            name='inventory_item',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='ledger.inventoryitem'),
+        ),
+        migrations.AddConstraint(
+            model_name='machinerequirement',
+            constraint=models.UniqueConstraint(condition=models.Q(('component_machine__isnull', False)), fields=('machine', 'component_machine'), name='unique_machine_component'),
+        ),
+        migrations.AddConstraint(
+            model_name='machinerequirement',
+            constraint=models.CheckConstraint(condition=models.Q(models.Q(('component_machine__isnull', True), ('inventory_item__isnull', False)), models.Q(('component_machine__isnull', False), ('inventory_item__isnull', True)), _connector='OR'), name='requirement_item_or_component'),
+        ),
+        migrations.AddConstraint(
+            model_name='machinerequirement',
+            constraint=models.CheckConstraint(condition=models.Q(('component_machine', models.F('machine')), _negated=True), name='requirement_not_own_component'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0.1 on 2026-10-19 05:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0014_machine_requirement_component'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlannedOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.DecimalField(decimal_places=4, max_digits=15)),
+                ('need_date', models.DateField(help_text='Date the material is needed')),
+                ('order_date', models.DateField(help_text='Latest date to place the order')),
+                ('status', models.CharField(choices=[('planned', 'Planned'), ('released', 'Released'), ('received', 'Received'), ('cancelled', 'Cancelled')], default='planned', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('inventory_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='planned_orders', to='ledger.inventoryitem')),
+            ],
+            options={
+                'ordering': ['order_date', 'inventory_item'],
+                'indexes': [models.Index(fields=['status', 'inventory_item'], name='ledger_plan_status_7f0ce0_idx')],
+            },
+        ),
+    ]
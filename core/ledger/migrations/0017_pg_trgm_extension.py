@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+def create_trigram_extension(apps, schema_editor):
+    # Trigram search (ledger/search.py) needs pg_trgm on PostgreSQL; other backends don't use it.
+    # Done by hand instead of TrigramExtension() so this migration imports nothing from
+    # django.contrib.postgres, which needs psycopg installed.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0016_model_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_extension, migrations.RunPython.noop),
+    ]
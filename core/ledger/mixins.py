@@ -8,6 +8,32 @@ class SoftDeleteManager(models.Manager):
         return super().get_queryset().filter(deleted=False)
 
 
+class TrackChangesMixin:
+    """
+    Remembers the field values an instance was loaded with so save hooks and signals
+    can tell which fields actually changed without re-reading the row.
+    """
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def loaded_value(self, field_name, default=None):
+        """Value of a field as it was loaded from the database"""
+        return getattr(self, '_loaded_values', {}).get(field_name, default)
+
+    def has_changed(self, *field_names):
+        """True if any of the given fields differ from the loaded values (or the instance was not loaded)"""
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return True
+        return any(
+            field_name not in loaded or loaded[field_name] != getattr(self, field_name)
+            for field_name in field_names
+        )
+
+
 class SoftDeleteMixin(models.Model):
     """
     Abstract mixin that adds audit fields and soft delete functionality.
@@ -0,0 +1,28 @@
+"""
+Change counters for per-process caches.
+
+Each counter is a ModelVersion row, so a bump in one worker invalidates the caches of every
+worker regardless of the cache backend. Reading a counter is a single primary-key-sized
+lookup on the unique name. Bump counters from transaction.on_commit (see
+bump_version_on_commit) so no process rebuilds a cache from rows it cannot see yet and a
+rolled-back change leaves the counter alone.
+"""
+from django.db import transaction
+from django.db.models import F
+
+from .models import ModelVersion
+
+
+def get_version(name):
+    return ModelVersion.objects.filter(name=name).values_list('value', flat=True).first() or 0
+
+
+def bump_version(name):
+    if not ModelVersion.objects.filter(name=name).update(value=F('value') + 1):
+        ModelVersion.objects.get_or_create(name=name)
+        ModelVersion.objects.filter(name=name).update(value=F('value') + 1)
+    return get_version(name)
+
+
+def bump_version_on_commit(name):
+    transaction.on_commit(lambda: bump_version(name))
@@ -1,11 +1,14 @@
-from django.db import models
+from django.apps import apps
+from django.db import models, connection, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Concat, Substr
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from decimal import Decimal
-from .mixins import SoftDeleteMixin
+from .mixins import SoftDeleteMixin, TrackChangesMixin
 
 
-class Company(SoftDeleteMixin):
+class Company(TrackChangesMixin, SoftDeleteMixin):
     """Company model for tracking client/vendor information"""
     name = models.CharField(max_length=200, unique=True)
     email = models.EmailField(blank=True, null=True)
@@ -21,14 +24,29 @@ class Company(SoftDeleteMixin):
     def __str__(self):
         return self.name
 
+    @staticmethod
+    def with_balances(queryset):
+        """Annotate invoice and payment totals so the balance properties need no extra queries"""
+        def total(model):
+            return models.Subquery(
+                model.objects.filter(company=models.OuterRef('pk')).order_by()
+                .values('company').annotate(total=models.Sum('amount')).values('total'),
+                output_field=models.DecimalField(max_digits=15, decimal_places=2)
+            )
+        return queryset.annotate(invoice_total=total(Invoice), payment_total=total(Payment))
+
     @property
     def total_debit(self):
         """Calculate total debit (invoices) for this company"""
+        if hasattr(self, 'invoice_total'):
+            return self.invoice_total or Decimal('0.00')
         return self.invoices.aggregate(total=models.Sum('amount'))['total'] or Decimal('0.00')
 
     @property
     def total_credit(self):
         """Calculate total credit (payments) for this company"""
+        if hasattr(self, 'payment_total'):
+            return self.payment_total or Decimal('0.00')
         return self.payments.aggregate(total=models.Sum('amount'))['total'] or Decimal('0.00')
 
     @property
@@ -37,10 +55,97 @@ class Company(SoftDeleteMixin):
         return self.total_debit - self.total_credit
 
 
+class DocumentSequence(models.Model):
+    """Per-prefix, per-year counter behind document numbers such as QT-2026-0001"""
+    # Document number fields per prefix, used to seed a new counter from existing rows
+    NUMBER_FIELDS = {
+        'QT': ('ledger.Quotation', 'quotation_number'),
+        'INV': ('ledger.Invoice', 'invoice_number'),
+        'PAY': ('ledger.Payment', 'payment_number'),
+        'DM': ('ledger.Demand', 'reference_number'),
+    }
+
+    prefix = models.CharField(max_length=20)
+    year = models.PositiveIntegerField()
+    last_value = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('prefix', 'year')
+
+    def __str__(self):
+        return f"{self.prefix}-{self.year}: {self.last_value}"
+
+    @staticmethod
+    def format_number(prefix, year, value):
+        return f'{prefix}-{year}-{value:04d}'
+
+    @classmethod
+    def reserve(cls, prefix, count=1, year=None):
+        """
+        Allocate `count` consecutive numbers with a single row-level increment and return
+        them formatted. The UPDATE holds the row lock until the surrounding transaction ends,
+        so concurrent workers never hand out the same number.
+        """
+        year = year or timezone.localdate().year
+        with transaction.atomic():
+            last_value = cls._increment(prefix, year, count)
+            if last_value is None:
+                cls._create_counter(prefix, year)
+                last_value = cls._increment(prefix, year, count)
+        return [cls.format_number(prefix, year, value) for value in range(last_value - count + 1, last_value + 1)]
+
+    @classmethod
+    def next_number(cls, prefix, year=None):
+        return cls.reserve(prefix, 1, year)[0]
+
+    @classmethod
+    def _increment(cls, prefix, year, count):
+        """New last_value of the counter, None if it does not exist yet"""
+        if connection.features.can_return_columns_from_insert:
+            # Backends that support RETURNING on INSERT support it on UPDATE too
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"UPDATE {cls._meta.db_table} SET last_value = last_value + %s "
+                    f"WHERE prefix = %s AND year = %s RETURNING last_value",
+                    [count, prefix, year]
+                )
+                row = cursor.fetchone()
+            return row[0] if row else None
+
+        updated = cls.objects.filter(prefix=prefix, year=year).update(last_value=F('last_value') + count)
+        if not updated:
+            return None
+        return cls.objects.filter(prefix=prefix, year=year).values_list('last_value', flat=True).get()
+
+    @classmethod
+    def _create_counter(cls, prefix, year):
+        """Create the counter, starting after the highest number already issued with this prefix"""
+        start = 0
+        if prefix in cls.NUMBER_FIELDS:
+            label, field = cls.NUMBER_FIELDS[prefix]
+            model = apps.get_model(label)
+            numbers = model.all_objects.filter(**{f'{field}__startswith': f'{prefix}-{year}-'})\
+                .values_list(field, flat=True)
+            for number in numbers:
+                suffix = number.rsplit('-', 1)[-1]
+                if suffix.isdigit():
+                    start = max(start, int(suffix))
+        cls.objects.get_or_create(prefix=prefix, year=year, defaults={'last_value': start})
+
+
+class ModelVersion(models.Model):
+    """Change counter shared by every process, used to invalidate per-process caches"""
+    name = models.CharField(max_length=100, unique=True)
+    value = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
 class Invoice(SoftDeleteMixin):
     """Invoice model representing debit entries (money owed to us/from company)"""
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='invoices')
-    invoice_number = models.CharField(max_length=50, unique=True)
+    invoice_number = models.CharField(max_length=50, unique=True, blank=True)
     invoice_date = models.DateField()
     description = models.TextField(blank=True, null=True)
     amount = models.DecimalField(
@@ -56,11 +161,16 @@ class Invoice(SoftDeleteMixin):
     def __str__(self):
         return f"{self.invoice_number} - {self.company.name} - {self.amount}"
 
+    def save(self, *args, **kwargs):
+        if not self.invoice_number:
+            self.invoice_number = DocumentSequence.next_number('INV')
+        super().save(*args, **kwargs)
+
 
 class Payment(SoftDeleteMixin):
     """Payment model representing credit entries (money received/payments made)"""
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='payments')
-    payment_number = models.CharField(max_length=50, unique=True)
+    payment_number = models.CharField(max_length=50, unique=True, blank=True)
     payment_date = models.DateField()
     description = models.TextField(blank=True, null=True)
     amount = models.DecimalField(
@@ -88,6 +198,11 @@ class Payment(SoftDeleteMixin):
     def __str__(self):
         return f"{self.payment_number} - {self.company.name} - {self.amount}"
 
+    def save(self, *args, **kwargs):
+        if not self.payment_number:
+            self.payment_number = DocumentSequence.next_number('PAY')
+        super().save(*args, **kwargs)
+
 
 class LedgerEntry(SoftDeleteMixin):
     """Generic ledger entry model that combines invoices and payments for easy querying"""
@@ -200,16 +315,67 @@ class Location(SoftDeleteMixin):
     parent = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE, related_name='children')
     description = models.TextField(blank=True, null=True)
 
+    # Materialized path of ids from the root down to this location, e.g. "/1/4/9/"
+    path = models.CharField(max_length=255, blank=True, default='', editable=False, db_index=True)
+    depth = models.PositiveIntegerField(default=0, editable=False)
+
     class Meta:
         ordering = ['name']
 
     def __str__(self):
-        full_name = self.name
-        if self.parent:
-            full_name = f"{self.parent.str()} > {full_name}"
-        return full_name
+        if not self.parent_id:
+            return self.name
+        if not self.path:
+            return f"{self.parent} > {self.name}"
+        # All ancestors in a single query instead of one per level
+        ancestor_ids = self.ancestor_ids()
+        names = dict(Location.all_objects.filter(pk__in=ancestor_ids).values_list('id', 'name'))
+        return ' > '.join([names[pk] for pk in ancestor_ids if pk in names] + [self.name])
+
+    @staticmethod
+    def subtree_q(path, prefix=''):
+        """
+        Q matching every location whose path starts with `path` (the node and its descendants).
+        Written as a range so it uses the path index on every backend; '0' sorts right after '/'.
+        `prefix` points the lookup through a relation, e.g. 'location__'.
+        """
+        return Q(**{f'{prefix}path__gte': path, f'{prefix}path__lt': path[:-1] + '0'})
+
+    def ancestor_ids(self):
+        """Ids of all ancestors, root first"""
+        return [int(pk) for pk in self.path.strip('/').split('/')[:-1]]
+
+    def descendants(self, include_self=False):
+        queryset = Location.objects.filter(Location.subtree_q(self.path))
+        if not include_self:
+            queryset = queryset.exclude(pk=self.pk)
+        return queryset
+
+    def save(self, *args, **kwargs):
+        parent_path = '/'
+        if self.parent_id:
+            parent_path = Location.all_objects.filter(pk=self.parent_id).values_list('path', flat=True).first() or '/'
+            if self.pk and f'/{self.pk}/' in parent_path:
+                raise ValueError("A location cannot be moved under itself or one of its descendants")
+
+        super().save(*args, **kwargs)
 
-class InventoryItem(SoftDeleteMixin):
+        new_path = f'{parent_path}{self.pk}/'
+        if new_path == self.path:
+            return
+
+        old_path, old_depth = self.path, self.depth
+        new_depth = new_path.count('/') - 2
+        Location.all_objects.filter(pk=self.pk).update(path=new_path, depth=new_depth)
+        if old_path:
+            # Re-root the whole subtree in one statement
+            Location.all_objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                path=Concat(Value(new_path), Substr('path', len(old_path) + 1)),
+                depth=F('depth') + (new_depth - old_depth),
+            )
+        self.path, self.depth = new_path, new_depth
+
+class InventoryItem(TrackChangesMixin, SoftDeleteMixin):
     """Inventory item model for managing products/services"""
     name = models.CharField(max_length=200)
     description = models.TextField(blank=True, null=True)
@@ -247,16 +413,33 @@ class InventoryItem(SoftDeleteMixin):
     default_location = models.ForeignKey(Location, on_delete=models.SET_NULL, null=True, blank=True, related_name='items')
     batch_tracking = models.BooleanField(default=False, help_text="Enable batch/lot tracking for this item")
 
+    # Maintained on every save so reorder alerts never need a full scan
+    below_reorder = models.BooleanField(default=False, editable=False, help_text="Stock is at or below the reorder level")
+    reorder_status_changed_at = models.DateTimeField(null=True, blank=True, editable=False)
+
     class Meta:
         ordering = ['name']
         indexes = [
             models.Index(fields=['name']),
             models.Index(fields=['category']),
+            models.Index(fields=['below_reorder', 'name']),
+            models.Index(fields=['reorder_status_changed_at']),
         ]
 
     def __str__(self):
         return f"{self.name} - Rs {self.unit_price}/{self.unit}"
 
+    def save(self, *args, **kwargs):
+        # Flip the reorder flag (and stamp the change for polling clients) when stock crosses the level
+        below_reorder = self.reorder_level > 0 and self.stock_quantity <= self.reorder_level
+        if below_reorder != self.below_reorder:
+            self.below_reorder = below_reorder
+            self.reorder_status_changed_at = timezone.now()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'below_reorder', 'reorder_status_changed_at'}
+        super().save(*args, **kwargs)
+
 
 class Batch(SoftDeleteMixin):
     """Batch/Lot tracking for items"""
@@ -264,11 +447,31 @@ class Batch(SoftDeleteMixin):
     batch_number = models.CharField(max_length=100)
     manufacturing_date = models.DateField(null=True, blank=True)
     expiry_date = models.DateField(null=True, blank=True)
+    balance = models.DecimalField(
+        max_digits=15,
+        decimal_places=4,
+        default=Decimal('0.0000'),
+        editable=False,
+        help_text="Quantity on hand in the item's base unit, maintained by stock transactions"
+    )
     
     class Meta:
         unique_together = ('item', 'batch_number')
         verbose_name_plural = "Batches"
         ordering = ['-created_at']
+        indexes = [
+            # Only live batches with stock matter for picking and expiry alerts
+            models.Index(
+                fields=['item', 'expiry_date'],
+                name='batch_fefo_idx',
+                condition=Q(deleted=False, balance__gt=0),
+            ),
+            models.Index(
+                fields=['expiry_date'],
+                name='batch_expiry_idx',
+                condition=Q(deleted=False, balance__gt=0),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.item.name} - {self.batch_number}"
@@ -333,6 +536,12 @@ class StockTransaction(SoftDeleteMixin):
     def __str__(self):
         return f"{self.get_transaction_type_display()} - {self.item.name} ({self.quantity} {self.unit.code if self.unit else ''})"
 
+    def signed_base_quantity(self):
+        """Base quantity with the sign of its effect on stock (issues are negative)"""
+        if self.transaction_type == 'issue':
+            return -self.base_quantity
+        return self.base_quantity
+
     def save(self, *args, **kwargs):
         # Calculate base quantity
         if not self.unit or not self.item.base_unit:
@@ -366,6 +575,10 @@ class StockTransaction(SoftDeleteMixin):
 
         # Update Item Stock Quantity
         is_new = self.pk is None
+        if is_new and self.batch_id:
+            Batch.all_objects.filter(pk=self.batch_id).update(
+                balance=F('balance') + self.signed_base_quantity()
+            )
         
         # We only update stock on creation to avoid double-counting on edits
         # Edits should be handled by a separate adjustment transaction or requiring a delete+recreate flow
@@ -394,7 +607,7 @@ class StockTransaction(SoftDeleteMixin):
         # Improve this logic in signals or manager method later. Use signals.py for cleaner separation?
         # For now, I'll rely on a signal or separate method, NOT save() to avoid recursion or side effects.
 
-class Quotation(SoftDeleteMixin):
+class Quotation(TrackChangesMixin, SoftDeleteMixin):
     """Quotation/Estimate model for creating quotations"""
     STATUS_CHOICES = [
         ('draft', 'Draft'),
@@ -457,31 +670,112 @@ class Quotation(SoftDeleteMixin):
     
     notes = models.TextField(blank=True, null=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft')
+    invoice = models.OneToOneField(
+        Invoice,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='quotation',
+        help_text='Invoice created from this quotation'
+    )
 
     class Meta:
         ordering = ['-quotation_date', '-created_at']
         indexes = [
             models.Index(fields=['company', 'quotation_date']),
             models.Index(fields=['status']),
+            models.Index(fields=['status', 'valid_until']),
         ]
 
     def __str__(self):
         return f"{self.quotation_number} - {self.company.name} - Rs {self.total_amount}"
 
-    def calculate_totals(self):
-        """Calculate subtotal, tax, discount, and total amounts"""
+    @classmethod
+    def convert_to_invoices(cls, quotations, user=None, invoice_date=None):
+        """
+        Create one invoice and its ledger entry per accepted, not yet invoiced quotation, in bulk.
+        Returns (invoices, skipped) where skipped is a list of (quotation, reason).
+        """
+        invoice_date = invoice_date or timezone.localdate()
+        now = timezone.now()
+
+        with transaction.atomic():
+            # Lock the rows so a quotation cannot be converted twice concurrently
+            locked = cls.objects.select_for_update().filter(pk__in=[q.pk for q in quotations])\
+                .select_related('company').order_by('pk')
+
+            convertible = []
+            skipped = []
+            for quotation in locked:
+                if quotation.invoice_id:
+                    skipped.append((quotation, 'Already invoiced'))
+                elif quotation.status != 'accepted':
+                    skipped.append((quotation, f'Status is {quotation.status}, not accepted'))
+                elif quotation.total_amount <= 0:
+                    skipped.append((quotation, 'Total amount is zero'))
+                else:
+                    convertible.append(quotation)
+
+            if not convertible:
+                return [], skipped
+
+            numbers = DocumentSequence.reserve('INV', len(convertible))
+            invoices = Invoice.objects.bulk_create([
+                Invoice(
+                    company_id=quotation.company_id,
+                    invoice_number=number,
+                    invoice_date=invoice_date,
+                    description=f'Against quotation {quotation.quotation_number}',
+                    amount=quotation.total_amount,
+                    reference=quotation.quotation_number,
+                    created_by=user,
+                )
+                for quotation, number in zip(convertible, numbers)
+            ])
+
+            # bulk_create skips the post_save signal that normally writes the ledger entry
+            LedgerEntry.objects.bulk_create([
+                LedgerEntry(
+                    company_id=invoice.company_id,
+                    transaction_type='debit',
+                    transaction_number=invoice.invoice_number,
+                    transaction_date=invoice.invoice_date,
+                    description=invoice.description,
+                    amount=invoice.amount,
+                    reference=invoice.reference,
+                    invoice=invoice,
+                    created_by=user,
+                )
+                for invoice in invoices
+            ])
+
+            for quotation, invoice in zip(convertible, invoices):
+                quotation.invoice = invoice
+                quotation.updated_at = now
+                quotation.updated_by = user
+            cls.objects.bulk_update(convertible, ['invoice', 'updated_at', 'updated_by'])
+
+        return invoices, skipped
+
+    def calculate_totals(self, subtotal=None):
+        """
+        Calculate subtotal, tax, discount, and total amounts.
+        Pass `subtotal` when the items are already in memory to skip the aggregate query.
+        """
         # Calculate subtotal from items
-        self.subtotal = sum(item.subtotal for item in self.items.all())
+        if subtotal is None:
+            subtotal = self.items.aggregate(total=models.Sum('subtotal'))['total'] or Decimal('0.00')
+        self.subtotal = subtotal
         
         # Calculate tax amount
         if self.tax:
-            self.tax_amount = (self.subtotal * self.tax.rate) / Decimal('100.00')
+            self.tax_amount = ((self.subtotal * self.tax.rate) / Decimal('100.00')).quantize(Decimal('0.01'))
         else:
             self.tax_amount = Decimal('0.00')
         
         # Calculate discount amount
         if self.discount_type == 'percentage':
-            self.discount_amount = (self.subtotal * self.discount_value) / Decimal('100.00')
+            self.discount_amount = ((self.subtotal * self.discount_value) / Decimal('100.00')).quantize(Decimal('0.01'))
         else:
             self.discount_amount = self.discount_value
         
@@ -495,23 +789,29 @@ class Quotation(SoftDeleteMixin):
     def save(self, *args, **kwargs):
         # Auto-generate quotation number if not set
         if not self.quotation_number:
-            from datetime import datetime
-            year = datetime.now().year
-            last_quotation = Quotation.objects.filter(
-                quotation_number__startswith=f'QT-{year}-'
-            ).order_by('-quotation_number').first()
-            
-            if last_quotation:
-                last_number = int(last_quotation.quotation_number.split('-')[-1])
-                new_number = last_number + 1
-            else:
-                new_number = 1
-            
-            self.quotation_number = f'QT-{year}-{new_number:04d}'
+            self.quotation_number = DocumentSequence.next_number('QT')
         
         super().save(*args, **kwargs)
 
 
+class QuotationMonthlyStat(models.Model):
+    """Rollup of quotation count and value per month, status and company, kept current by signals"""
+    month = models.DateField(help_text='First day of the month of the quotation date')
+    status = models.CharField(max_length=20, choices=Quotation.STATUS_CHOICES)
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='quotation_stats')
+    count = models.IntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=17, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        unique_together = ('month', 'status', 'company')
+        indexes = [
+            models.Index(fields=['month', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} {self.status} {self.company_id}: {self.count} / {self.total_amount}"
+
+
 class QuotationItem(SoftDeleteMixin):
     """Quotation item model for line items in quotations"""
     quotation = models.ForeignKey(Quotation, on_delete=models.CASCADE, related_name='items')
@@ -557,28 +857,46 @@ class QuotationItem(SoftDeleteMixin):
         return f"{self.item_name} x {self.quantity} - Rs {self.subtotal}"
 
     def calculate_subtotal(self):
-        """Calculate subtotal for this item"""
-        self.subtotal = self.quantity * self.unit_price
+        """Calculate subtotal for this item, rounded to the 2 decimal places it is stored with"""
+        self.subtotal = Decimal(str(self.quantity * self.unit_price)).quantize(Decimal('0.01'))
 
-    def save(self, *args, **kwargs):
-        # Auto-populate from inventory item if selected
+    @staticmethod
+    def total(items):
+        """Sum of the items' (rounded) subtotals, equal to what the aggregate over stored rows gives"""
+        return sum((item.subtotal for item in items), Decimal('0.00'))
+
+    def populate_from_inventory(self):
+        """Auto-populate from inventory item if selected"""
         if self.inventory_item and not self.item_name:
             self.item_name = self.inventory_item.name
             self.description = self.inventory_item.description
             self.unit_price = self.inventory_item.unit_price
             self.unit = self.inventory_item.unit
+
+    @classmethod
+    def prepare(cls, quotation, items_data):
+        """Build unsaved items with their subtotals, ready for bulk_create"""
+        items = [cls(quotation=quotation, **item_data) for item_data in items_data]
+        for item in items:
+            item.populate_from_inventory()
+            item.calculate_subtotal()
+        return items
+
+    def save(self, *args, update_quotation=True, **kwargs):
+        self.populate_from_inventory()
         
         # Calculate subtotal
         self.calculate_subtotal()
         
         super().save(*args, **kwargs)
         
-        # Update quotation totals
-        self.quotation.calculate_totals()
-        self.quotation.save()
+        # Update quotation totals (single-item edits only; batch paths recalculate once themselves)
+        if update_quotation:
+            self.quotation.calculate_totals()
+            self.quotation.save()
 
 
-class Machine(SoftDeleteMixin):
+class Machine(TrackChangesMixin, SoftDeleteMixin):
     """Machine model for manufacturing units"""
     name = models.CharField(max_length=200, unique=True)
     code = models.CharField(max_length=50, unique=True, blank=True, null=True)
@@ -590,17 +908,40 @@ class Machine(SoftDeleteMixin):
     def __str__(self):
         return self.name
 
-class MachineRequirement(models.Model):
-    """BOM: Materials required per unit/run of a machine"""
+class MachineRequirement(TrackChangesMixin, models.Model):
+    """BOM: Materials or sub-assembly machines required per unit/run of a machine"""
     machine = models.ForeignKey(Machine, on_delete=models.CASCADE, related_name='requirements')
-    inventory_item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE)
+    inventory_item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE, null=True, blank=True)
+    component_machine = models.ForeignKey(
+        Machine, on_delete=models.PROTECT, null=True, blank=True, related_name='used_in',
+        help_text="Sub-assembly machine, exploded into its own requirements"
+    )
     quantity = models.DecimalField(max_digits=10, decimal_places=4, help_text="Quantity required per unit/run")
 
     class Meta:
         unique_together = ('machine', 'inventory_item')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['machine', 'component_machine'],
+                condition=models.Q(component_machine__isnull=False),
+                name='unique_machine_component'
+            ),
+            models.CheckConstraint(
+                condition=(
+                    models.Q(inventory_item__isnull=False, component_machine__isnull=True)
+                    | models.Q(inventory_item__isnull=True, component_machine__isnull=False)
+                ),
+                name='requirement_item_or_component'
+            ),
+            models.CheckConstraint(
+                condition=~models.Q(component_machine=models.F('machine')),
+                name='requirement_not_own_component'
+            ),
+        ]
 
     def __str__(self):
-        return f"{self.inventory_item.name} for {self.machine.name}"
+        component = self.component_machine if self.component_machine_id else self.inventory_item
+        return f"{component.name} for {self.machine.name}"
 
 class Demand(SoftDeleteMixin):
     """Demand sheet for a specific client/order"""
@@ -619,6 +960,11 @@ class Demand(SoftDeleteMixin):
     def __str__(self):
         return f"Demand for {self.company.name} - {self.date}"
 
+    def save(self, *args, **kwargs):
+        if not self.reference_number:
+            self.reference_number = DocumentSequence.next_number('DM')
+        super().save(*args, **kwargs)
+
 class DemandMachineOrder(models.Model):
     """Input: Specific Machines requested in a Demand"""
     demand = models.ForeignKey(Demand, on_delete=models.CASCADE, related_name='machine_orders')
@@ -637,3 +983,28 @@ class DemandMaterial(models.Model):
     def __str__(self):
         return f"{self.quantity} x {self.inventory_item.name}"
 
+class PlannedOrder(models.Model):
+    """Suggested purchase from an MRP run; released orders count as open receipts in later runs"""
+    STATUS_CHOICES = [
+        ('planned', 'Planned'),
+        ('released', 'Released'),
+        ('received', 'Received'),
+        ('cancelled', 'Cancelled'),
+    ]
+    inventory_item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE, related_name='planned_orders')
+    quantity = models.DecimalField(max_digits=15, decimal_places=4)
+    need_date = models.DateField(help_text="Date the material is needed")
+    order_date = models.DateField(help_text="Latest date to place the order")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='planned')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['order_date', 'inventory_item']
+        indexes = [
+            models.Index(fields=['status', 'inventory_item']),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.inventory_item.name} by {self.need_date}"
+
@@ -0,0 +1,182 @@
+"""
+On-disk cache for rendered quotation PDFs.
+
+A cached file is named after the quotation id and a content version: a hash of the
+quotation, company and item timestamps, the logo file's mtime and TEMPLATE_VERSION.
+Any edit, or a replaced logo, therefore produces a new file name and stale renders are
+never served. The version doubles as the ETag of
+the download. The directory is kept under QUOTATION_PDF_CACHE_MAX_BYTES by removing the
+least recently served files.
+"""
+import hashlib
+import io
+import os
+import tempfile
+import threading
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Max, Q
+
+from . import pdf_workers
+from .models import Quotation, QuotationItem
+from .pdf_templates import get_quotation_template
+from .quotation_pdf import quotation_snapshot, render_snapshot_pdf
+
+# Bump whenever the PDF layout changes so existing renders are invalidated
+TEMPLATE_VERSION = '1'
+
+_lock = threading.Lock()
+
+
+def cache_dir():
+    return str(getattr(settings, 'QUOTATION_PDF_CACHE_DIR', os.path.join(settings.BASE_DIR, 'pdf_cache')))
+
+
+def max_cache_bytes():
+    return getattr(settings, 'QUOTATION_PDF_CACHE_MAX_BYTES', 200 * 1024 * 1024)
+
+
+def content_version(quotation):
+    """(version, last_modified) of everything that ends up in the quotation's PDF"""
+    items = QuotationItem.all_objects.filter(quotation=quotation).aggregate(
+        last_updated=Max('updated_at'),
+        count=Count('id', filter=Q(deleted=False)),
+    )
+    timestamps = [quotation.updated_at, quotation.company.updated_at]
+    if items['last_updated']:
+        timestamps.append(items['last_updated'])
+
+    # A replaced logo changes the PDF without touching any row
+    logo_path, logo_mtime = get_quotation_template().logo.stat()
+
+    key = '|'.join([
+        TEMPLATE_VERSION, str(logo_path), str(logo_mtime), str(quotation.pk), str(items['count']),
+        *(timestamp.isoformat() for timestamp in timestamps)
+    ])
+    return hashlib.sha1(key.encode()).hexdigest()[:20], max(timestamps)
+
+
+def cache_path(quotation_id, version):
+    return os.path.join(cache_dir(), f'quotation_{quotation_id}_{version}.pdf')
+
+
+def store(quotation, path):
+    """Render the quotation into path; returns the PDF bytes"""
+    pdf = pdf_workers.render(render_snapshot_pdf, quotation_snapshot(quotation))
+    directory = cache_dir()
+    os.makedirs(directory, exist_ok=True)
+
+    # Write to a temporary file and rename, so readers never see a partial PDF
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file:
+            tmp_file.write(pdf)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+    remove_stale(quotation.pk, keep=path)
+    evict()
+    return pdf
+
+
+def touch(path):
+    """Mark a cached PDF as recently used for eviction; False if it is gone"""
+    try:
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def get_pdf_path(quotation, version=None):
+    """Path of the cached PDF for the quotation's current content, rendering it on a miss"""
+    version = version or content_version(quotation)[0]
+    path = cache_path(quotation.pk, version)
+    if not touch(path):
+        store(quotation, path)
+    return path
+
+
+def open_pdf(quotation, version=None):
+    """
+    Binary file object with the quotation's current PDF, rendering it on a miss.
+    The file is opened before anything else is checked: an open file stays readable even if
+    a concurrent eviction or re-render removes it, so there is no window for a missing file.
+    """
+    version = version or content_version(quotation)[0]
+    path = cache_path(quotation.pk, version)
+    try:
+        pdf_file = open(path, 'rb')
+    except FileNotFoundError:
+        pdf = store(quotation, path)
+        try:
+            return open(path, 'rb')
+        except FileNotFoundError:
+            # Evicted again straight away (a cache smaller than one PDF); serve from memory
+            return io.BytesIO(pdf)
+    touch(path)
+    return pdf_file
+
+
+def remove_stale(quotation_id, keep=None):
+    """Remove renders of older versions of a quotation"""
+    directory = cache_dir()
+    if not os.path.isdir(directory):
+        return
+    prefix = f'quotation_{quotation_id}_'
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.startswith(prefix) and path != keep:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def evict(max_bytes=None):
+    """Remove least recently used PDFs until the cache fits in max_bytes"""
+    max_bytes = max_cache_bytes() if max_bytes is None else max_bytes
+    directory = cache_dir()
+
+    with _lock:
+        entries = []
+        total = 0
+        for entry in os.scandir(directory):
+            if not entry.name.endswith('.pdf'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def prerender(quotation_id):
+    """Render a quotation into the cache ahead of its first download"""
+    try:
+        quotation = Quotation.objects.select_related('company').get(pk=quotation_id)
+        get_pdf_path(quotation)
+    except Quotation.DoesNotExist:
+        pass
+    finally:
+        connection.close()
+
+
+def prerender_in_background(quotation_id):
+    threading.Thread(target=prerender, args=(quotation_id,), daemon=True).start()
@@ -0,0 +1,381 @@
+"""
+Process-wide PDF templates.
+
+Paragraph styles, table styles and the company logo are built once per process, on first
+use, and shared by every PDF rendered afterwards. They are only read while a document is
+built, so sharing them between threads is safe. The logo is encoded into a PDF image
+stream once and re-encoded when the file on disk changes.
+"""
+import copy
+import os
+import threading
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.pdfbase.pdfdoc import PDFImageXObject
+from reportlab.platypus import TableStyle, Flowable
+
+_script_dir = os.path.dirname(os.path.abspath(__file__))  # .../core/ledger
+_core_dir = os.path.dirname(_script_dir)                  # .../core
+_project_root = os.path.dirname(_core_dir)                # .../inventory_hr_system
+
+# Logo path: try frontend assets, then project root static
+LOGO_PATHS = [
+    os.path.join(_project_root, 'frontend', 'public', 'assets', 'images', 'logo.jpeg'),
+    os.path.join(_project_root, 'assets', 'images', 'logo.jpeg'),
+]
+
+
+class CachedImage(Flowable):
+    """
+    Draws a PDF image XObject whose encoded stream was built once for the process.
+    Each document gets its own shallow copy, so only the immutable stream bytes are shared.
+    """
+
+    def __init__(self, xobject, width, height):
+        super().__init__()
+        self.xobject = xobject
+        self.width = width
+        self.height = height
+
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+
+    def draw(self):
+        # Uses PDFDocument internals (_doc, idToObject, Reference, addForm), checked against
+        # reportlab 5.0.1, which requirements.txt pins; recheck them when upgrading
+        canvas = self.canv
+        document = canvas._doc
+        name = self.xobject.name
+        reg_name = document.getXObjectName(name)
+        if document.idToObject.get(reg_name) is None:
+            document.Reference(copy.copy(self.xobject), reg_name)
+            document.addForm(name, document.idToObject[reg_name])
+
+        # Image XObjects are drawn into the unit square
+        canvas.saveState()
+        canvas.scale(self.width, self.height)
+        canvas.doForm(name)
+        canvas.restoreState()
+
+
+class Logo:
+    """Company logo encoded as a PDF image once, re-encoded when the file's mtime changes"""
+
+    def __init__(self, paths):
+        self.paths = paths
+        self.lock = threading.Lock()
+        self.path = None
+        self.mtime = None
+        self.xobject = None
+
+    def find(self):
+        for path in self.paths:
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def stat(self):
+        """(path, mtime) of the logo file in use, (None, None) when there is none"""
+        path = self.path if self.path and os.path.isfile(self.path) else self.find()
+        try:
+            return path, os.path.getmtime(path) if path else None
+        except OSError:
+            return None, None
+
+    def load(self):
+        """Current logo image XObject, or None when there is no usable logo"""
+        path, mtime = self.stat()
+        if path != self.path or mtime != self.mtime:
+            with self.lock:
+                xobject = None
+                if path:
+                    try:
+                        xobject = PDFImageXObject(f'CompanyLogo{int(mtime)}', path)
+                    except Exception:
+                        xobject = None
+                self.path, self.mtime, self.xobject = path, mtime, xobject
+        return self.xobject
+
+    def image(self, width, height):
+        """A logo flowable for one document, None when there is no logo"""
+        xobject = self.load()
+        if xobject is None:
+            return None
+        return CachedImage(xobject, width, height)
+
+
+class QuotationTemplate:
+    """Styles shared by every quotation PDF"""
+
+    def __init__(self):
+        styles = getSampleStyleSheet()
+        self.styles = styles
+
+        # Company header style
+        self.company_name_style = ParagraphStyle(
+            'CompanyName',
+            parent=styles['Heading1'],
+            fontSize=28,
+            textColor=colors.black,
+            spaceAfter=2,
+            alignment=TA_CENTER,
+            fontName='Helvetica-Bold',
+            leading=32
+        )
+
+        self.company_subtitle_style = ParagraphStyle(
+            'CompanySubtitle',
+            parent=styles['Normal'],
+            fontSize=14,
+            textColor=colors.black,
+            spaceAfter=20,
+            alignment=TA_LEFT,
+            fontName='Helvetica-Bold'
+        )
+
+        self.date_style = ParagraphStyle(
+            'DateStyle',
+            parent=styles['Normal'],
+            fontSize=10,
+            textColor=colors.black,
+            alignment=TA_RIGHT,
+            fontName='Helvetica'
+        )
+
+        self.subject_style = ParagraphStyle(
+            'SubjectStyle',
+            parent=styles['Normal'],
+            fontSize=11,
+            textColor=colors.black,
+            spaceAfter=10,
+            alignment=TA_LEFT,
+            fontName='Helvetica-Bold'
+        )
+
+        self.quotation_heading_style = ParagraphStyle(
+            'QuotationHeading',
+            parent=styles['Heading2'],
+            fontSize=16,
+            textColor=colors.black,
+            spaceAfter=10,
+            alignment=TA_CENTER,
+            fontName='Helvetica-Bold',
+            leading=20
+        )
+
+        self.item_title_style = ParagraphStyle(
+            'ItemTitle',
+            parent=styles['Normal'],
+            fontSize=11,
+            textColor=colors.black,
+            spaceAfter=8,
+            alignment=TA_LEFT,
+            fontName='Helvetica-Bold',
+            underline=True
+        )
+
+        self.item_desc_style = ParagraphStyle(
+            'ItemDesc',
+            parent=styles['Normal'],
+            fontSize=10,
+            textColor=colors.black,
+            spaceAfter=4,
+            alignment=TA_LEFT,
+            fontName='Helvetica',
+            leftIndent=20
+        )
+
+        self.footer_style = ParagraphStyle(
+            'FooterStyle',
+            parent=styles['Normal'],
+            fontSize=9,
+            textColor=colors.white,
+            alignment=TA_CENTER,
+            fontName='Helvetica'
+        )
+
+        self.ton_style = ParagraphStyle(
+            'TonStyle',
+            parent=styles['Normal'],
+            fontSize=11,
+            textColor=colors.black,
+            spaceAfter=10,
+            alignment=TA_LEFT,
+            fontName='Helvetica-Bold'
+        )
+
+        self.terms_header_style = ParagraphStyle(
+            'TermsHeader',
+            parent=styles['Heading2'],
+            fontSize=14,
+            textColor=colors.black,
+            spaceAfter=20,
+            alignment=TA_CENTER,
+            fontName='Helvetica-Bold',
+            leading=18
+        )
+
+        self.terms_style = ParagraphStyle(
+            'TermsStyle',
+            parent=styles['Normal'],
+            fontSize=10,
+            textColor=colors.black,
+            spaceAfter=8,
+            alignment=TA_LEFT,
+            fontName='Helvetica',
+            leftIndent=0,
+            leading=14
+        )
+
+        self.thank_you_style = ParagraphStyle(
+            'ThankYouStyle',
+            parent=styles['Normal'],
+            fontSize=11,
+            textColor=colors.black,
+            spaceAfter=30,
+            alignment=TA_LEFT,
+            fontName='Helvetica-Bold',
+            leading=14
+        )
+
+        self.signature_style = ParagraphStyle(
+            'SignatureStyle',
+            parent=styles['Normal'],
+            fontSize=10,
+            textColor=colors.black,
+            spaceAfter=5,
+            alignment=TA_LEFT,
+            fontName='Helvetica',
+            leading=14
+        )
+
+        self.company_sign_style = ParagraphStyle(
+            'CompanySignStyle',
+            parent=styles['Normal'],
+            fontSize=11,
+            textColor=colors.black,
+            spaceAfter=20,
+            alignment=TA_LEFT,
+            fontName='Helvetica-Bold',
+            leading=14
+        )
+
+        self.header_table_style = TableStyle([
+            ('VALIGN', (0, 0), (-1, 0), 'MIDDLE'),
+            ('LINEBELOW', (0, 0), (-1, 0), 2, colors.black),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+            ('LEFTPADDING', (0, 0), (0, 0), 0),
+            ('RIGHTPADDING', (0, 0), (0, 0), 12),
+        ])
+
+        self.rate_table_style = TableStyle([
+            ('ALIGN', (1, 0), (-1, 0), 'RIGHT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+        ])
+
+        self.total_table_style = TableStyle([
+            ('ALIGN', (0, 0), (0, 0), 'LEFT'),
+            ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('LINEABOVE', (0, 0), (-1, 0), 1, colors.black),
+            ('TOPPADDING', (0, 0), (-1, 0), 10),
+        ])
+
+        self.logo = Logo(LOGO_PATHS)
+
+
+class LedgerTemplate:
+    """Styles shared by every ledger export PDF"""
+
+    def __init__(self):
+        styles = getSampleStyleSheet()
+        self.styles = styles
+
+        self.title_style = ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=18,
+            textColor=colors.HexColor('#1a237e'),
+            spaceAfter=30,
+            alignment=TA_CENTER
+        )
+        self.heading_style = ParagraphStyle(
+            'CustomHeading',
+            parent=styles['Heading2'],
+            fontSize=14,
+            textColor=colors.HexColor('#283593'),
+            spaceAfter=12
+        )
+        self.normal_style = styles['Normal']
+
+        self.company_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#e3f2fd')),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+            ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+            ('TOPPADDING', (0, 0), (-1, -1), 8),
+            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+        ])
+
+        self.summary_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, -1), colors.white),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 11),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
+            ('TOPPADDING', (0, 0), (-1, -1), 10),
+            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+        ])
+
+        self.ledger_table_style = TableStyle([
+            # Header row
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1a237e')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('ALIGN', (3, 1), (-1, -1), 'RIGHT'),  # Right align amounts
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('TOPPADDING', (0, 0), (-1, 0), 12),
+            # Data rows
+            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 9),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f5f5f5')]),
+            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ])
+
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def get_template(template_class):
+    """The process-wide instance of a template class, built on first use"""
+    template = _templates.get(template_class)
+    if template is None:
+        with _templates_lock:
+            template = _templates.get(template_class)
+            if template is None:
+                template = _templates[template_class] = template_class()
+    return template
+
+
+def get_quotation_template():
+    return get_template(QuotationTemplate)
+
+
+def get_ledger_template():
+    return get_template(LedgerTemplate)
@@ -0,0 +1,123 @@
+"""
+Local process pool for PDF rendering.
+
+reportlab is CPU bound and holds the GIL, so rendering inside a web worker blocks every
+other request that worker could serve. Request handlers instead hand plain document data
+(see quotation_pdf.quotation_snapshot) to a pool of spawned processes and wait for the
+bytes. Processes are recycled after PDF_WORKER_MAX_JOBS jobs so memory from large
+documents is returned to the system, and a pool with a job past PDF_WORKER_TIMEOUT is
+terminated and replaced so a stuck render cannot hold a process forever.
+
+Settings:
+    PDF_WORKER_PROCESSES  pool size per web process; 0 renders inline (default 2)
+    PDF_WORKER_MAX_JOBS   jobs a process handles before it is replaced (default 50)
+    PDF_WORKER_TIMEOUT    seconds to wait for one document (default 60)
+"""
+import atexit
+import multiprocessing
+import os
+import threading
+
+from django.conf import settings
+
+
+class RenderTimeout(Exception):
+    """A document did not render within PDF_WORKER_TIMEOUT"""
+
+
+_pool = None
+_pool_pid = None
+_lock = threading.Lock()
+
+
+# Set in pool processes so app startup skips process-wide background work (see LedgerConfig.ready)
+WORKER_ENV_FLAG = 'LEDGER_PDF_WORKER'
+
+
+def _init_worker():
+    # Rendering functions live in modules that import models
+    os.environ[WORKER_ENV_FLAG] = '1'
+    import django
+    django.setup()
+
+
+def is_worker():
+    return os.environ.get(WORKER_ENV_FLAG) == '1'
+
+
+def pool_size():
+    return getattr(settings, 'PDF_WORKER_PROCESSES', 2)
+
+
+def timeout():
+    return getattr(settings, 'PDF_WORKER_TIMEOUT', 60)
+
+
+def get_pool():
+    """The rendering pool of this process, started on first use"""
+    global _pool, _pool_pid
+    # A pool inherited through fork (e.g. gunicorn --preload) belongs to the parent
+    if _pool is None or _pool_pid != os.getpid():
+        with _lock:
+            if _pool is None or _pool_pid != os.getpid():
+                context = multiprocessing.get_context('spawn')
+                _pool = context.Pool(
+                    processes=pool_size(),
+                    initializer=_init_worker,
+                    maxtasksperchild=getattr(settings, 'PDF_WORKER_MAX_JOBS', 50),
+                )
+                _pool_pid = os.getpid()
+    return _pool
+
+
+def shutdown():
+    global _pool
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.terminate()
+        _pool.join()
+    _pool = None
+
+
+def discard_pool(pool):
+    """
+    Terminate a pool whose job timed out, so the process stuck on it does not keep its slot.
+    Jobs other threads still wait for on that pool fail with RenderTimeout; the next render
+    starts a fresh pool.
+    """
+    global _pool
+    with _lock:
+        if _pool is pool:
+            _pool = None
+    pool.terminate()
+
+
+atexit.register(shutdown)
+
+
+def render(func, *args):
+    """Run func(*args) in the pool and return its result"""
+    if pool_size() <= 0:
+        return func(*args)
+    pool = get_pool()
+    result = pool.apply_async(func, args)
+    try:
+        return result.get(timeout())
+    except multiprocessing.TimeoutError:
+        discard_pool(pool)
+        raise RenderTimeout(f'PDF rendering did not finish within {timeout()} seconds')
+
+
+def render_many(func, items):
+    """[func(item) for item in items], spread over the pool"""
+    items = list(items)
+    if pool_size() <= 0 or len(items) <= 1:
+        return [func(item) for item in items]
+    pool = get_pool()
+    result = pool.map_async(func, items, chunksize=max(1, len(items) // (pool_size() * 4)))
+    # Every process works through its share of the documents in parallel
+    per_process = -(-len(items) // pool_size())
+    try:
+        return result.get(timeout() * per_process)
+    except multiprocessing.TimeoutError:
+        discard_pool(pool)
+        raise RenderTimeout(f'PDF rendering did not finish within {timeout() * per_process} seconds')
@@ -0,0 +1,139 @@
+"""
+Material requirements planning (MRP).
+
+A run plans every item needed by open (draft and finalized) demands. Gross requirements
+per item and demand date come from one grouped query over DemandMaterial. Released planned
+orders are scheduled receipts on their need date, and stock on hand is the opening balance.
+Each item's dates are walked in order. Whenever the projected balance would drop below the
+item's reorder level, a planned order tops it back up, due on that date and to be placed
+MRP_LEAD_TIME_DAYS earlier. Past-due requirements are planned for today. Every run replaces
+the planned (not yet released) orders of the previous one.
+
+simulate() answers what-if questions for machine quantities without saving anything.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q, Sum
+from django.utils import timezone
+
+from .bom import get_bom_matrix
+from .models import DemandMaterial, InventoryItem, PlannedOrder
+
+OPEN_DEMAND_STATUSES = ('draft', 'finalized')
+
+
+def lead_time():
+    return timedelta(days=getattr(settings, 'MRP_LEAD_TIME_DAYS', 7))
+
+
+def time_phased(rows, today):
+    """{item_id: {date: quantity}} from (item_id, date, quantity) rows, past dates moved to today"""
+    buckets = {}
+    for item_id, day, quantity in rows:
+        item_buckets = buckets.setdefault(item_id, {})
+        day = max(day, today)
+        item_buckets[day] = item_buckets.get(day, 0) + quantity
+    return buckets
+
+
+def plan_item(on_hand, reorder_level, gross, receipts, today):
+    """[(need_date, quantity)] keeping the projected balance at or above the reorder level"""
+    orders = []
+    balance = on_hand
+    for day in sorted({today, *gross, *receipts}):
+        balance += receipts.get(day, 0) - gross.get(day, 0)
+        if balance < reorder_level:
+            quantity = reorder_level - balance
+            orders.append((day, quantity))
+            balance += quantity
+    return orders
+
+
+def plan(today=None):
+    """Unsaved PlannedOrders for all open demands"""
+    today = today or timezone.localdate()
+    lead = lead_time()
+    open_demand = Q(demand__deleted=False, demand__status__in=OPEN_DEMAND_STATUSES)
+
+    gross = time_phased(
+        DemandMaterial.objects.filter(open_demand)
+        .values_list('inventory_item_id', 'demand__date')
+        .annotate(total=Sum('quantity'))
+        .order_by(),
+        today
+    )
+    receipts = time_phased(
+        PlannedOrder.objects.filter(status='released')
+        .values_list('inventory_item_id', 'need_date')
+        .annotate(total=Sum('quantity'))
+        .order_by(),
+        today
+    )
+
+    # Items with open requirements, and items already short of their reorder level
+    needed = DemandMaterial.objects.filter(open_demand, inventory_item=OuterRef('pk'))
+    items = InventoryItem.objects.filter(Q(Exists(needed)) | Q(below_reorder=True))\
+        .values_list('id', 'stock_quantity', 'reorder_level')
+
+    orders = []
+    for item_id, on_hand, reorder_level in items:
+        for need_date, quantity in plan_item(
+            on_hand, reorder_level, gross.get(item_id, {}), receipts.get(item_id, {}), today
+        ):
+            orders.append(PlannedOrder(
+                inventory_item_id=item_id,
+                quantity=quantity,
+                need_date=need_date,
+                order_date=max(need_date - lead, today),
+            ))
+    return orders
+
+
+def run_mrp(today=None):
+    """Replace the planned orders with a fresh plan; returns a summary of the run"""
+    orders = plan(today)
+    with transaction.atomic():
+        replaced, _ = PlannedOrder.objects.filter(status='planned').delete()
+        PlannedOrder.objects.bulk_create(orders)
+    return {
+        'planned_orders': len(orders),
+        'items': len({order.inventory_item_id for order in orders}),
+        'replaced_orders': replaced,
+    }
+
+
+def simulate(orders):
+    """
+    Materials, shortages against stock and estimated material cost of a what-if demand.
+    Reads the cached BOM matrix and the items involved; nothing is written.
+    """
+    totals = get_bom_matrix().multiply(orders)
+    items = InventoryItem.all_objects.filter(pk__in=list(totals))\
+        .values('id', 'name', 'unit', 'stock_quantity', 'unit_price')\
+        .order_by('name')
+
+    materials = []
+    total_cost = Decimal('0.00')
+    for item in items:
+        quantity = totals[item['id']].quantize(Decimal('0.0001'))
+        cost = (quantity * item['unit_price']).quantize(Decimal('0.01'))
+        total_cost += cost
+        materials.append({
+            'inventory_item': item['id'],
+            'inventory_item_name': item['name'],
+            'inventory_item_unit': item['unit'],
+            'quantity': quantity,
+            'on_hand': item['stock_quantity'],
+            'shortfall': max(quantity - item['stock_quantity'], Decimal('0')),
+            'unit_price': item['unit_price'],
+            'estimated_cost': cost,
+        })
+
+    return {
+        'materials': materials,
+        'short_items': sum(1 for material in materials if material['shortfall'] > 0),
+        'estimated_cost': total_cost,
+    }
@@ -2,15 +2,15 @@ from django.http import HttpResponse
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib import colors
 from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
+from reportlab.platypus import SimpleDocTemplate, Table, Paragraph, Spacer, PageBreak
 from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
 from io import BytesIO
 from decimal import Decimal
-import os
 import math
+import zipfile
+
+from . import pdf_workers
+from .pdf_templates import get_quotation_template
 
 
 def generate_quotation_pdf(quotation):
@@ -18,145 +18,104 @@ def generate_quotation_pdf(quotation):
     # Create the HttpResponse object with PDF headers
     response = HttpResponse(content_type='application/pdf')
     response['Content-Disposition'] = f'attachment; filename="quotation_{quotation.quotation_number}.pdf"'
+    response.write(render_quotation_pdf(quotation))
     
+    return response
+
+
+def quotation_snapshot(quotation):
+    """Plain, picklable copy of everything the PDF shows, so rendering needs no database"""
+    return {
+        'quotation_number': quotation.quotation_number,
+        'company_name': quotation.company.name if quotation.company else '',
+        'quotation_date': quotation.quotation_date,
+        'ton': quotation.ton,
+        'total_amount': quotation.total_amount,
+        'notes': quotation.notes,
+        'items': [
+            {'item_name': item.item_name, 'description': item.description, 'subtotal': item.subtotal}
+            for item in quotation.items.all()
+        ],
+    }
+
+
+def render_quotation_pdf(quotation):
+    """Render a quotation to PDF bytes"""
+    return render_snapshot_pdf(quotation_snapshot(quotation))
+
+
+def render_snapshot_pdf(data):
+    """Render a quotation snapshot to PDF bytes"""
+    return render_merged_pdf([data])
+
+
+def render_merged_pdf(snapshots):
+    """Render several quotation snapshots into one PDF, each starting on a new page"""
     # Create the PDF object using BytesIO buffer
     buffer = BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=40, leftMargin=40,
                            topMargin=40, bottomMargin=60)
     
+    # Styles and logo are shared by every quotation PDF in this process
+    template = get_quotation_template()
+    
     # Container for the 'Flowable' objects
     elements = []
+    for position, data in enumerate(snapshots):
+        if position:
+            elements.append(PageBreak())
+        elements.extend(quotation_story(data, template))
     
-    # Define styles
-    styles = getSampleStyleSheet()
-    
-    # Company header style
-    company_name_style = ParagraphStyle(
-        'CompanyName',
-        parent=styles['Heading1'],
-        fontSize=28,
-        textColor=colors.black,
-        spaceAfter=2,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold',
-        leading=32
-    )
-    
-    company_subtitle_style = ParagraphStyle(
-        'CompanySubtitle',
-        parent=styles['Normal'],
-        fontSize=14,
-        textColor=colors.black,
-        spaceAfter=20,
-        alignment=TA_LEFT,
-        fontName='Helvetica-Bold'
-    )
-    
-    date_style = ParagraphStyle(
-        'DateStyle',
-        parent=styles['Normal'],
-        fontSize=10,
-        textColor=colors.black,
-        alignment=TA_RIGHT,
-        fontName='Helvetica'
-    )
-    
-    subject_style = ParagraphStyle(
-        'SubjectStyle',
-        parent=styles['Normal'],
-        fontSize=11,
-        textColor=colors.black,
-        spaceAfter=10,
-        alignment=TA_LEFT,
-        fontName='Helvetica-Bold'
-    )
-    
-    quotation_heading_style = ParagraphStyle(
-        'QuotationHeading',
-        parent=styles['Heading2'],
-        fontSize=16,
-        textColor=colors.black,
-        spaceAfter=10,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold',
-        leading=20
-    )
-    
-    item_title_style = ParagraphStyle(
-        'ItemTitle',
-        parent=styles['Normal'],
-        fontSize=11,
-        textColor=colors.black,
-        spaceAfter=8,
-        alignment=TA_LEFT,
-        fontName='Helvetica-Bold',
-        underline=True
-    )
-    
-    item_desc_style = ParagraphStyle(
-        'ItemDesc',
-        parent=styles['Normal'],
-        fontSize=10,
-        textColor=colors.black,
-        spaceAfter=4,
-        alignment=TA_LEFT,
-        fontName='Helvetica',
-        leftIndent=20
-    )
-    
-    footer_style = ParagraphStyle(
-        'FooterStyle',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor=colors.white,
-        alignment=TA_CENTER,
-        fontName='Helvetica'
-    )
-    
-    # Logo path: try frontend assets, then project root static
-    _script_dir = os.path.dirname(os.path.abspath(__file__))  # .../core/ledger
-    _core_dir = os.path.dirname(_script_dir)                  # .../core
-    _project_root = os.path.dirname(_core_dir)                # .../inventory_hr_system
-    _logo_path = os.path.join(_project_root, 'frontend', 'public', 'assets', 'images', 'logo.jpeg')
-    if not os.path.isfile(_logo_path):
-        _logo_path = os.path.join(_project_root, 'assets', 'images', 'logo.jpeg')
-    if not os.path.isfile(_logo_path):
-        _logo_path = None
+    # Build PDF with watermark and footer on each page
+    doc.build(elements, onFirstPage=add_page_decorations, onLaterPages=add_page_decorations)
+    
+    # Get the value of the BytesIO buffer
+    pdf = buffer.getvalue()
+    buffer.close()
+    
+    return pdf
+
+
+def render_zip(snapshots):
+    """ZIP archive with one PDF per quotation snapshot, rendered across the PDF worker pool"""
+    pdfs = pdf_workers.render_many(render_snapshot_pdf, snapshots)
+    
+    buffer = BytesIO()
+    # PDFs are already compressed, so store them as they are
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+        for data, pdf in zip(snapshots, pdfs):
+            archive.writestr(f'quotation_{data["quotation_number"]}.pdf', pdf)
+    return buffer.getvalue()
+
 
+def quotation_story(data, template):
+    """Flowables for one quotation"""
+    elements = []
+    
     # Header with logo and company name
-    if _logo_path:
-        try:
-            logo_img = Image(_logo_path, width=1.0*inch, height=1.0*inch)
-            header_data = [[logo_img, Paragraph('<b>HAQ BAHOO MIAN & COMPANY</b>', company_name_style)]]
-            header_table = Table(header_data, colWidths=[1.2*inch, 5.8*inch])
-        except Exception:
-            header_data = [[Paragraph('<b>HAQ BAHOO MIAN & COMPANY</b>', company_name_style)]]
-            header_table = Table(header_data, colWidths=[7*inch])
+    logo_img = template.logo.image(width=1.0*inch, height=1.0*inch)
+    if logo_img is not None:
+        header_data = [[logo_img, Paragraph('<b>HAQ BAHOO MIAN & COMPANY</b>', template.company_name_style)]]
+        header_table = Table(header_data, colWidths=[1.2*inch, 5.8*inch])
     else:
-        header_data = [[Paragraph('<b>HAQ BAHOO MIAN & COMPANY</b>', company_name_style)]]
+        header_data = [[Paragraph('<b>HAQ BAHOO MIAN & COMPANY</b>', template.company_name_style)]]
         header_table = Table(header_data, colWidths=[7*inch])
 
-    header_table.setStyle(TableStyle([
-        ('VALIGN', (0, 0), (-1, 0), 'MIDDLE'),
-        ('LINEBELOW', (0, 0), (-1, 0), 2, colors.black),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-        ('LEFTPADDING', (0, 0), (0, 0), 0),
-        ('RIGHTPADDING', (0, 0), (0, 0), 12),
-    ]))
+    header_table.setStyle(template.header_table_style)
     elements.append(header_table)
     elements.append(Spacer(1, 10))
     
     # Subtitle and Date row (client company for this quotation)
-    client_name = quotation.company.name if quotation.company else ''
+    client_name = data['company_name']
     
     # Build subtitle row - include ton if available
     subtitle_left = client_name
-    if quotation.ton is not None and quotation.ton > 0:
-        subtitle_left += f' | Ton: {float(quotation.ton):,.2f}'
+    if data['ton'] is not None and data['ton'] > 0:
+        subtitle_left += f' | Ton: {float(data["ton"]):,.2f}'
     
     subtitle_date_data = [
-        [Paragraph(subtitle_left, company_subtitle_style), 
-         Paragraph(f'DATE  {quotation.quotation_date.strftime("%d/%m/%Y")}', date_style)]
+        [Paragraph(subtitle_left, template.company_subtitle_style), 
+         Paragraph(f'DATE  {data["quotation_date"].strftime("%d/%m/%Y")}', template.date_style)]
     ]
     subtitle_date_table = Table(subtitle_date_data, colWidths=[4*inch, 3*inch])
     elements.append(subtitle_date_table)
@@ -164,177 +123,110 @@ def generate_quotation_pdf(quotation):
     
     # Subject and Quotation heading
     subject_quotation_data = [
-        [Paragraph('SUBJECT', subject_style), 
-         Paragraph('<b>Q U O T A T I O N</b>', quotation_heading_style)]
+        [Paragraph('SUBJECT', template.subject_style), 
+         Paragraph('<b>Q U O T A T I O N</b>', template.quotation_heading_style)]
     ]
     subject_quotation_table = Table(subject_quotation_data, colWidths=[1.5*inch, 5.5*inch])
     elements.append(subject_quotation_table)
     elements.append(Spacer(1, 15))
     
     # Items section
-    for idx, item in enumerate(quotation.items.all(), 1):
+    for idx, item in enumerate(data['items'], 1):
         # Item title with rate
-        item_title = Paragraph(f'<i>FOR {item.item_name.upper()}</i>', item_title_style)
+        item_title = Paragraph(f'<i>FOR {item["item_name"].upper()}</i>', template.item_title_style)
         elements.append(item_title)
         elements.append(Spacer(1, 8))
         
         # Item description
-        if item.description:
-            desc_lines = item.description.split('\n')
+        if item['description']:
+            desc_lines = item['description'].split('\n')
             for line_idx, line in enumerate(desc_lines, 1):
-                desc_para = Paragraph(f'{line_idx}. {line}', item_desc_style)
+                desc_para = Paragraph(f'{line_idx}. {line}', template.item_desc_style)
                 elements.append(desc_para)
         
         # Rate aligned to right
         rate_data = [
-            ['', f'RATE', f'{float(item.subtotal):,.0f}/-']
+            ['', f'RATE', f'{float(item["subtotal"]):,.0f}/-']
         ]
         rate_table = Table(rate_data, colWidths=[4*inch, 1.5*inch, 1.5*inch])
-        rate_table.setStyle(TableStyle([
-            ('ALIGN', (1, 0), (-1, 0), 'RIGHT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ]))
+        rate_table.setStyle(template.rate_table_style)
         elements.append(rate_table)
         elements.append(Spacer(1, 15))
     
     # Ton display (if available)
-    if quotation.ton is not None and quotation.ton > 0:
-        ton_style = ParagraphStyle(
-            'TonStyle',
-            parent=styles['Normal'],
-            fontSize=11,
-            textColor=colors.black,
-            spaceAfter=10,
-            alignment=TA_LEFT,
-            fontName='Helvetica-Bold'
-        )
-        ton_para = Paragraph(f'<b>Total Ton: {float(quotation.ton):,.2f}</b>', ton_style)
+    if data['ton'] is not None and data['ton'] > 0:
+        ton_para = Paragraph(f'<b>Total Ton: {float(data["ton"]):,.2f}</b>', template.ton_style)
         elements.append(ton_para)
         elements.append(Spacer(1, 10))
     
     # Total
     total_data = [
-        ['TOTAL', f'{float(quotation.total_amount):,.0f}/-']
+        ['TOTAL', f'{float(data["total_amount"]):,.0f}/-']
     ]
     total_table = Table(total_data, colWidths=[5.5*inch, 1.5*inch])
-    total_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (0, 0), 'LEFT'),
-        ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('LINEABOVE', (0, 0), (-1, 0), 1, colors.black),
-        ('TOPPADDING', (0, 0), (-1, 0), 10),
-    ]))
+    total_table.setStyle(template.total_table_style)
     elements.append(total_table)
     
     # Add Terms and Conditions page if notes exist
-    if quotation.notes:
+    if data['notes']:
         elements.append(Spacer(1, 20))
         # Page break for terms page
         elements.append(PageBreak())
         
         # Terms and Conditions Header
-        terms_header_style = ParagraphStyle(
-            'TermsHeader',
-            parent=styles['Heading2'],
-            fontSize=14,
-            textColor=colors.black,
-            spaceAfter=20,
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold',
-            leading=18
-        )
-        
-        terms_title = Paragraph('GENERAL TERMS & CONDITION', terms_header_style)
+        terms_title = Paragraph('GENERAL TERMS & CONDITION', template.terms_header_style)
         elements.append(terms_title)
         elements.append(Spacer(1, 15))
         
-        # Terms content from notes
-        terms_style = ParagraphStyle(
-            'TermsStyle',
-            parent=styles['Normal'],
-            fontSize=10,
-            textColor=colors.black,
-            spaceAfter=8,
-            alignment=TA_LEFT,
-            fontName='Helvetica',
-            leftIndent=0,
-            leading=14
-        )
-        
-        # Split notes by newlines and create paragraphs
-        notes_lines = quotation.notes.split('\n')
+        # Terms content: split notes by newlines and create paragraphs
+        notes_lines = data['notes'].split('\n')
         for line in notes_lines:
             if line.strip():  # Only add non-empty lines
-                terms_para = Paragraph(line.strip(), terms_style)
+                terms_para = Paragraph(line.strip(), template.terms_style)
                 elements.append(terms_para)
         
         elements.append(Spacer(1, 30))
         
         # Thanking you section
-        thank_you_style = ParagraphStyle(
-            'ThankYouStyle',
-            parent=styles['Normal'],
-            fontSize=11,
-            textColor=colors.black,
-            spaceAfter=30,
-            alignment=TA_LEFT,
-            fontName='Helvetica-Bold',
-            leading=14
-        )
-        
-        thank_you = Paragraph('THANKING YOU.', thank_you_style)
+        thank_you = Paragraph('THANKING YOU.', template.thank_you_style)
         elements.append(thank_you)
         elements.append(Spacer(1, 20))
         
         # Signature section
-        signature_style = ParagraphStyle(
-            'SignatureStyle',
-            parent=styles['Normal'],
-            fontSize=10,
-            textColor=colors.black,
-            spaceAfter=5,
-            alignment=TA_LEFT,
-            fontName='Helvetica',
-            leading=14
-        )
-        
-        yours_faithfully = Paragraph('Yours faithfully,', signature_style)
+        yours_faithfully = Paragraph('Yours faithfully,', template.signature_style)
         elements.append(yours_faithfully)
         elements.append(Spacer(1, 5))
         
-        company_sign_style = ParagraphStyle(
-            'CompanySignStyle',
-            parent=styles['Normal'],
-            fontSize=11,
-            textColor=colors.black,
-            spaceAfter=20,
-            alignment=TA_LEFT,
-            fontName='Helvetica-Bold',
-            leading=14
-        )
-        
-        company_sign = Paragraph('HAQ BAHOO MIAN & COMPANY', company_sign_style)
+        company_sign = Paragraph('HAQ BAHOO MIAN & COMPANY', template.company_sign_style)
         elements.append(company_sign)
         elements.append(Spacer(1, 10))
         
-        signature_line = Paragraph('Signature _________________', signature_style)
+        signature_line = Paragraph('Signature _________________', template.signature_style)
         elements.append(signature_line)
     
-    # Build PDF with watermark and footer on each page
-    doc.build(elements, onFirstPage=add_page_decorations, onLaterPages=add_page_decorations)
-    
-    # Get the value of the BytesIO buffer and write it to the response
-    pdf = buffer.getvalue()
-    buffer.close()
-    response.write(pdf)
-    
-    return response
+    return elements
+
+
+WATERMARK_FORM = 'QuotationWatermark'
+FOOTER_FORM = 'QuotationFooter'
+
+
+def draw_as_form(canvas, name, draw):
+    """Draw `draw(canvas)` into a form XObject the first time, then reuse it on every page"""
+    if not canvas.hasForm(name):
+        canvas.beginForm(name, lowerx=0, lowery=0, upperx=A4[0], uppery=A4[1])
+        draw(canvas)
+        canvas.endForm()
+    canvas.doForm(name)
 
 
 def add_watermark(canvas, doc):
     """Add company watermark to each page - diagonal repeating pattern"""
+    draw_as_form(canvas, WATERMARK_FORM, draw_watermark)
+
+
+def draw_watermark(canvas):
+    """Draw the watermark grid"""
     canvas.saveState()
     
     # Set watermark properties - semi-transparent and rotated
@@ -429,6 +321,11 @@ def add_watermark(canvas, doc):
 
 def add_footer(canvas, doc):
     """Add footer to each page - all items center-aligned"""
+    draw_as_form(canvas, FOOTER_FORM, draw_footer)
+
+
+def draw_footer(canvas):
+    """Draw the footer band"""
     canvas.saveState()
     
     # Blue footer bar
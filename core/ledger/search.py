@@ -0,0 +1,136 @@
+"""
+Full-text search for inventory items and companies.
+
+On SQLite every indexed model gets an FTS5 virtual table (rowid = model pk) holding its
+searchable columns. The tables are kept in sync by the save/delete signals in signals.py
+and can be rebuilt with `manage.py rebuild_search_index`. Every match is returned; the
+best SEARCH_RANKED_RESULTS are ordered by relevance and the rest follow in id order.
+Other backends fall back to trigram similarity (PostgreSQL + pg_trgm, created by migration
+0017) or a plain icontains filter.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, When, Q, Value, IntegerField
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Greatest
+
+from .models import InventoryItem, Company
+
+
+class SearchIndex:
+    """FTS5 mirror of a model's text columns, with ranked prefix search"""
+
+    def __init__(self, model, fields, weights):
+        self.model = model
+        self.fields = fields
+        self.weights = weights
+        self.table = f'{model._meta.db_table}_fts'
+
+    @staticmethod
+    def is_supported():
+        return connection.vendor == 'sqlite'
+
+    @staticmethod
+    def match_expression(query):
+        """Turn user input into an FTS5 query: every word must match as a prefix"""
+        terms = re.findall(r'\w+', query.lower())
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def create(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5("
+                f"{', '.join(self.fields)}, prefix='2 3', tokenize='unicode61 remove_diacritics 2')"
+            )
+
+    def rebuild(self):
+        """Repopulate the index from the live (non-deleted) rows"""
+        source = self.model._meta.db_table
+        columns = ', '.join(self.fields)
+        values = ', '.join(f"COALESCE({field}, '')" for field in self.fields)
+        self.create()
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+            cursor.execute(
+                f"INSERT INTO {self.table} (rowid, {columns}) "
+                f"SELECT id, {values} FROM {source} WHERE NOT deleted"
+            )
+
+    def update(self, instance):
+        if instance.deleted:
+            self.remove(instance.pk)
+            return
+        columns = ', '.join(self.fields)
+        placeholders = ', '.join(['%s'] * (len(self.fields) + 1))
+        values = [instance.pk] + [getattr(instance, field) or '' for field in self.fields]
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [instance.pk])
+            cursor.execute(f"INSERT INTO {self.table} (rowid, {columns}) VALUES ({placeholders})", values)
+
+    def remove(self, pk):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [pk])
+
+    def ranked_ids(self, query, limit):
+        expression = self.match_expression(query)
+        if not expression:
+            return []
+        weights = ', '.join(str(weight) for weight in self.weights)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s "
+                f"ORDER BY bm25({self.table}, {weights}) LIMIT %s",
+                [expression, limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def matching_ids(self, expression):
+        """Subquery of every matching rowid, for filtering without a limit"""
+        return RawSQL(f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s", [expression])
+
+    def search(self, queryset, query, ranked=None):
+        """Narrow `queryset` to rows matching `query`, best matches first"""
+        ranked = ranked or getattr(settings, 'SEARCH_RANKED_RESULTS', 500)
+
+        if self.is_supported():
+            ids = self.ranked_ids(query, ranked)
+            if not ids:
+                return queryset.none()
+            # Rank positions only for the best matches keep the SQL small; the others come after
+            rank = Case(
+                *[When(pk=pk, then=Value(position)) for position, pk in enumerate(ids)],
+                default=Value(len(ids)),
+                output_field=IntegerField()
+            )
+            return queryset.filter(pk__in=self.matching_ids(self.match_expression(query))).order_by(rank, 'pk')
+
+        contains = Q()
+        for field in self.fields:
+            contains |= Q(**{f'{field}__icontains': query})
+
+        if connection.vendor == 'postgresql':
+            # Needs the pg_trgm extension (migration 0017); icontains keeps short queries matching
+            from django.contrib.postgres.search import TrigramSimilarity
+            similarity = Greatest(*[TrigramSimilarity(field, query) for field in self.fields])
+            return queryset.annotate(search_rank=similarity)\
+                .filter(Q(search_rank__gt=0.1) | contains)\
+                .order_by('-search_rank')
+
+        return queryset.filter(contains)
+
+
+inventory_item_index = SearchIndex(
+    InventoryItem,
+    fields=['name', 'sku', 'description', 'category'],
+    weights=[10.0, 8.0, 1.0, 2.0],
+)
+
+company_index = SearchIndex(
+    Company,
+    fields=['name', 'contact_person', 'email', 'gstin'],
+    weights=[10.0, 3.0, 2.0, 5.0],
+)
+
+SEARCH_INDEXES = [inventory_item_index, company_index]
@@ -1,3 +1,6 @@
+from decimal import Decimal
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
 from django.contrib.auth.models import User, Group, Permission
 from django.contrib.contenttypes.models import ContentType
@@ -6,8 +9,9 @@ from .models import (
     Company, Invoice, Payment, LedgerEntry, Tax, 
     InventoryItem, Quotation, QuotationItem,
     Unit, Location, Batch, StockTransaction, Project,
-    Machine, MachineRequirement, Demand, DemandMachineOrder, DemandMaterial
+    Machine, MachineRequirement, Demand, DemandMachineOrder, DemandMaterial, PlannedOrder
 )
+from .bom import BomCycleError, creates_cycle, get_bom_matrix
 
 # --- Existing Serializers ---
 
@@ -195,6 +199,11 @@ class LocationSerializer(serializers.ModelSerializer):
         model = Location
         fields = '__all__'
 
+    def validate_parent(self, value):
+        if value and self.instance and self.instance.pk and f'/{self.instance.pk}/' in value.path:
+            raise serializers.ValidationError("A location cannot be moved under itself or one of its descendants")
+        return value
+
 class BatchSerializer(serializers.ModelSerializer):
     class Meta:
         model = Batch
@@ -270,7 +279,12 @@ class QuotationItemSerializer(serializers.ModelSerializer):
         }
     
     def validate(self, data):
-        # Ensure either inventory_item or manual item_name is provided
+        # Ensure either inventory_item or manual item_name is provided (partial edits keep the saved values)
+        if self.instance is not None and self.partial:
+            has_item = data.get('inventory_item', self.instance.inventory_item_id) or data.get('item_name', self.instance.item_name)
+            if not has_item:
+                raise serializers.ValidationError("Either inventory_item or item_name must be provided")
+            return data
         if not data.get('inventory_item') and not data.get('item_name'):
             raise serializers.ValidationError("Either inventory_item or item_name must be provided")
         
@@ -294,14 +308,14 @@ class QuotationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Quotation
         fields = '__all__'
-        read_only_fields = ['quotation_number', 'subtotal', 'tax_amount', 'discount_amount', 'total_amount']
+        read_only_fields = ['quotation_number', 'subtotal', 'tax_amount', 'discount_amount', 'total_amount', 'invoice']
 
 
 class QuotationListSerializer(serializers.ModelSerializer):
     """Lightweight serializer for list views"""
     company_name = serializers.ReadOnlyField(source='company.name')
     tax_name = serializers.ReadOnlyField(source='tax.name')
-    item_count = serializers.SerializerMethodField()
+    item_count = serializers.IntegerField(read_only=True)
     items = QuotationItemSerializer(many=True, read_only=True)
     
     class Meta:
@@ -309,11 +323,21 @@ class QuotationListSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'quotation_number', 'company', 'company_name', 
             'quotation_date', 'valid_until', 'subtotal', 'tax_amount', 'discount_amount', 'total_amount', 'status',
-            'tax_name', 'item_count', 'items', 'created_at', 'updated_at'
+            'tax_name', 'item_count', 'items', 'invoice', 'created_at', 'updated_at'
         ]
     
-    def get_item_count(self, obj):
-        return obj.items.count()
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Nested items are opt-in with ?include=items; item_count is annotated by the viewset
+        request = self.context.get('request')
+        include = request.query_params.get('include', '').split(',') if request else []
+        if 'items' not in include:
+            self.fields.pop('items')
+
+
+class NestedQuotationItemSerializer(QuotationItemSerializer):
+    """Quotation item inside a quotation payload; a known id marks an existing line to update"""
+    id = serializers.IntegerField(required=False, allow_null=True)
 
 
 class QuotationDetailSerializer(serializers.ModelSerializer):
@@ -321,50 +345,120 @@ class QuotationDetailSerializer(serializers.ModelSerializer):
     company_name = serializers.ReadOnlyField(source='company.name')
     tax_name = serializers.ReadOnlyField(source='tax.name')
     tax_rate = serializers.ReadOnlyField(source='tax.rate')
-    items = QuotationItemSerializer(many=True)
+    items = NestedQuotationItemSerializer(many=True)
     
     class Meta:
         model = Quotation
         fields = '__all__'
-        read_only_fields = ['quotation_number', 'subtotal', 'tax_amount', 'discount_amount', 'total_amount']
+        read_only_fields = ['quotation_number', 'subtotal', 'tax_amount', 'discount_amount', 'total_amount', 'invoice']
     
+    @transaction.atomic
     def create(self, validated_data):
         items_data = validated_data.pop('items', [])
-        quotation = Quotation.objects.create(**validated_data)
-        
         for item_data in items_data:
-            QuotationItem.objects.create(quotation=quotation, **item_data)
+            item_data.pop('quotation', None)
+            item_data.pop('id', None)
+        quotation = Quotation(**validated_data)
         
-        # Recalculate totals
-        quotation.calculate_totals()
+        # Totals come from the in-memory items, so the quotation is written once
+        items = QuotationItem.prepare(quotation, items_data)
+        quotation.calculate_totals(subtotal=QuotationItem.total(items))
         quotation.save()
         
+        for item in items:
+            item.quotation = quotation
+        QuotationItem.objects.bulk_create(items)
+        
         return quotation
     
+    @transaction.atomic
     def update(self, instance, validated_data):
         items_data = validated_data.pop('items', None)
         
         # Update quotation fields
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
-        instance.save()
         
-        # Update items if provided
+        # Update items if provided, otherwise recalculate from what is stored
+        subtotal = None
         if items_data is not None:
-            # Delete existing items
-            instance.items.all().delete()
-            
-            # Create new items
-            for item_data in items_data:
-                QuotationItem.objects.create(quotation=instance, **item_data)
+            subtotal = self.sync_items(instance, items_data)
         
-        # Recalculate totals
-        instance.calculate_totals()
+        instance.calculate_totals(subtotal=subtotal)
         instance.save()
         
         return instance
 
-        return instance
+    @staticmethod
+    def differs(item, attr, value):
+        """True if the incoming value changes the item; foreign keys compare by id so nothing is loaded"""
+        field = item._meta.get_field(attr)
+        if field.is_relation:
+            return getattr(item, field.attname) != (value.pk if value is not None else None)
+        return getattr(item, attr) != value
+
+    def sync_items(self, quotation, items_data):
+        """
+        Diff incoming items against the stored ones by id: changed lines are bulk updated,
+        lines without an id are bulk created and missing lines are soft-deleted in one UPDATE.
+        Returns the new subtotal of the quotation.
+        """
+        now = timezone.now()
+        existing = {item.pk: item for item in quotation.items.all()}
+        kept = []
+        changed_items = []
+        changed_fields = set()
+        new_items_data = []
+
+        for item_data in items_data:
+            item_data.pop('quotation', None)
+            pk = item_data.pop('id', None)
+            if pk is None:
+                new_items_data.append(item_data)
+                continue
+            if pk not in existing:
+                raise serializers.ValidationError({'items': f'Item {pk} does not belong to this quotation'})
+
+            item = existing.pop(pk)
+            kept.append(item)
+            changed = [attr for attr, value in item_data.items() if self.differs(item, attr, value)]
+            if not changed:
+                continue
+            for attr in changed:
+                setattr(item, attr, item_data[attr])
+            item.populate_from_inventory()
+            item.calculate_subtotal()
+            item.updated_at = now
+            item.updated_by = quotation.updated_by
+            changed_items.append(item)
+            changed_fields.update(changed)
+
+        if changed_items:
+            QuotationItem.objects.bulk_update(
+                changed_items,
+                [*changed_fields, 'item_name', 'description', 'unit_price', 'unit', 'subtotal', 'updated_at', 'updated_by']
+            )
+
+        new_items = QuotationItem.prepare(quotation, new_items_data)
+        if new_items:
+            QuotationItem.objects.bulk_create(new_items)
+
+        # Whatever was not sent back has been removed
+        if existing:
+            QuotationItem.objects.filter(pk__in=existing).update(
+                deleted=True, updated_at=now, updated_by=quotation.updated_by
+            )
+
+        return QuotationItem.total(kept + new_items)
+
+
+class InvoiceConversionSerializer(serializers.Serializer):
+    """Input of converting a quotation to an invoice"""
+    invoice_date = serializers.DateField(required=False, allow_null=True)
+
+class BulkInvoiceConversionSerializer(InvoiceConversionSerializer):
+    """Input of bulk conversion; without ids every accepted, uninvoiced quotation is converted"""
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, required=False)
 
 
 # --- Demand & Machine Mapping Serializers ---
@@ -372,10 +466,28 @@ class QuotationDetailSerializer(serializers.ModelSerializer):
 class MachineRequirementSerializer(serializers.ModelSerializer):
     inventory_item_name = serializers.ReadOnlyField(source='inventory_item.name')
     inventory_item_unit = serializers.ReadOnlyField(source='inventory_item.unit')
+    component_machine_name = serializers.ReadOnlyField(source='component_machine.name')
 
     class Meta:
         model = MachineRequirement
-        fields = ['id', 'machine', 'inventory_item', 'inventory_item_name', 'inventory_item_unit', 'quantity']
+        fields = [
+            'id', 'machine', 'inventory_item', 'inventory_item_name', 'inventory_item_unit',
+            'component_machine', 'component_machine_name', 'quantity'
+        ]
+
+    def validate(self, attrs):
+        def current(field):
+            return attrs[field] if field in attrs else getattr(self.instance, field, None)
+
+        machine = current('machine')
+        inventory_item = current('inventory_item')
+        component = current('component_machine')
+
+        if (inventory_item is None) == (component is None):
+            raise serializers.ValidationError('Set either an inventory item or a component machine')
+        if component is not None and creates_cycle(machine.pk, component.pk):
+            raise serializers.ValidationError({'component_machine': f'{component.name} already contains {machine.name}'})
+        return attrs
 
 class MachineSerializer(serializers.ModelSerializer):
     requirements = MachineRequirementSerializer(many=True, read_only=True)
@@ -399,6 +511,17 @@ class DemandMaterialSerializer(serializers.ModelSerializer):
         model = DemandMaterial
         fields = ['id', 'demand', 'inventory_item', 'inventory_item_name', 'inventory_item_unit', 'quantity']
 
+class PlannedOrderSerializer(serializers.ModelSerializer):
+    inventory_item_name = serializers.ReadOnlyField(source='inventory_item.name')
+    inventory_item_unit = serializers.ReadOnlyField(source='inventory_item.unit')
+
+    class Meta:
+        model = PlannedOrder
+        fields = [
+            'id', 'inventory_item', 'inventory_item_name', 'inventory_item_unit',
+            'quantity', 'need_date', 'order_date', 'status', 'created_at', 'updated_at'
+        ]
+
 class DemandSerializer(serializers.ModelSerializer):
     company_name = serializers.ReadOnlyField(source='company.name')
     machine_orders = DemandMachineOrderSerializer(many=True, read_only=True)
@@ -408,7 +531,32 @@ class DemandSerializer(serializers.ModelSerializer):
         model = Demand
         fields = '__all__'
 
-class CreateDemandSerializer(serializers.ModelSerializer):
+class MachineOrdersMixin:
+    """Validation of machine_orders input: [{"machine_id": 1, "quantity": 100}, ...]"""
+
+    def validate_machine_orders(self, value):
+        """Normalise orders to (machine_id, quantity) pairs and reject unknown machines"""
+        orders = []
+        for order_data in value:
+            machine_id = order_data.get('machine_id') or order_data.get('machine')
+            qty = order_data.get('quantity')
+
+            # Blank rows from the demand sheet are ignored
+            if not machine_id or not qty:
+                continue
+            try:
+                orders.append((int(machine_id), Decimal(str(qty))))
+            except (ValueError, TypeError, ArithmeticError):
+                raise serializers.ValidationError(f'Invalid order: {order_data}')
+
+        machine_ids = {machine_id for machine_id, _ in orders}
+        found = set(Machine.objects.filter(pk__in=machine_ids).values_list('pk', flat=True))
+        missing = sorted(machine_ids - found)
+        if missing:
+            raise serializers.ValidationError(f'Unknown machine ids: {missing}')
+        return orders
+
+class CreateDemandSerializer(MachineOrdersMixin, serializers.ModelSerializer):
     """Serializer for creating a demand with orders"""
     # Expected input: [{"machine_id": 1, "quantity": 100}, ...]
     machine_orders = serializers.ListField(
@@ -419,49 +567,28 @@ class CreateDemandSerializer(serializers.ModelSerializer):
         model = Demand
         fields = '__all__'
 
+    @transaction.atomic
     def create(self, validated_data):
-        machine_orders_data = validated_data.pop('machine_orders', [])
+        machine_orders = validated_data.pop('machine_orders', [])
         demand = Demand.objects.create(**validated_data)
-        
-        # Dictionary to aggregate material totals: { item_id: total_qty }
-        material_totals = {}
-
-        # 1. Process Order Inputs
-        for order_data in machine_orders_data:
-            machine_id = order_data.get('machine_id') or order_data.get('machine')
-            qty = order_data.get('quantity')
-            
-            if not machine_id or not qty:
-                continue
 
-            # Create Order Record
-            try:
-                machine = Machine.objects.get(pk=machine_id)
-                DemandMachineOrder.objects.create(demand=demand, machine=machine, quantity=qty)
-                
-                # 2. Calculate Materials for this Machine
-                # Fetch BOM
-                requirements = machine.requirements.all()
-                for req in requirements:
-
-                    # Safely handle decimal math
-                    from decimal import Decimal
-                    q_decimal = Decimal(str(qty))
-                    req_qty = req.quantity * q_decimal
-                    
-                    if req.inventory_item_id in material_totals:
-                        material_totals[req.inventory_item_id] += req_qty
-                    else:
-                        material_totals[req.inventory_item_id] = req_qty
-            except Machine.DoesNotExist:
-                continue
-        
-        # 3. Save Aggregated Materials
-        for item_id, total_qty in material_totals.items():
-            DemandMaterial.objects.create(
-                demand=demand,
-                inventory_item_id=item_id,
-                quantity=total_qty
-            )
-            
+        DemandMachineOrder.objects.bulk_create([
+            DemandMachineOrder(demand=demand, machine_id=machine_id, quantity=qty)
+            for machine_id, qty in machine_orders
+        ])
+
+        # Explode the BOMs of all ordered machines, sub-assemblies included: { item_id: total_qty }
+        try:
+            material_totals = get_bom_matrix().multiply(machine_orders)
+        except BomCycleError as exc:
+            raise serializers.ValidationError({'machine_orders': str(exc)})
+
+        DemandMaterial.objects.bulk_create([
+            DemandMaterial(demand=demand, inventory_item_id=item_id, quantity=total_qty)
+            for item_id, total_qty in material_totals.items()
+        ])
         return demand
+
+class SimulateDemandSerializer(MachineOrdersMixin, serializers.Serializer):
+    """Input of a what-if demand: machine orders only, nothing is saved"""
+    machine_orders = serializers.ListField(child=serializers.DictField(), allow_empty=False)
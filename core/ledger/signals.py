@@ -1,7 +1,15 @@
+from django.db.models import F
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
-from .models import Invoice, Payment, LedgerEntry, StockTransaction
+from .models import (
+    Invoice, Payment, LedgerEntry, StockTransaction, Batch, InventoryItem, Company, Machine, MachineRequirement, Quotation
+)
+from .search import inventory_item_index, company_index
+from .autocomplete import version_name
+from .model_versions import bump_version_on_commit
+from .bom import invalidate_bom_matrix
+from . import analytics, demand_sync
 
 
 @receiver(post_save, sender=Invoice)
@@ -135,3 +143,81 @@ def reverse_stock_on_delete(sender, instance, **kwargs):
         item.stock_quantity += qty
         
     item.save()
+
+    if instance.batch_id:
+        Batch.all_objects.filter(pk=instance.batch_id).update(
+            balance=F('balance') - instance.signed_base_quantity()
+        )
+
+
+SEARCH_INDEX_BY_MODEL = {
+    InventoryItem: inventory_item_index,
+    Company: company_index,
+}
+
+
+@receiver(post_save, sender=InventoryItem)
+@receiver(post_save, sender=Company)
+def update_search_index(sender, instance, created, update_fields=None, **kwargs):
+    """Mirror searchable columns (and soft deletes) into the full-text index"""
+    index = SEARCH_INDEX_BY_MODEL[sender]
+    if not index.is_supported():
+        return
+    if update_fields is not None and not set(update_fields) & {*index.fields, 'deleted'}:
+        return
+    # Stock postings save items without update_fields; leave the index alone unless its text changed
+    if created or instance.has_changed(*index.fields, 'deleted'):
+        index.update(instance)
+
+
+@receiver(post_delete, sender=InventoryItem)
+@receiver(post_delete, sender=Company)
+def remove_from_search_index(sender, instance, **kwargs):
+    index = SEARCH_INDEX_BY_MODEL[sender]
+    if index.is_supported():
+        index.remove(instance.pk)
+
+
+@receiver(post_save, sender=InventoryItem)
+@receiver(post_save, sender=Company)
+@receiver(post_save, sender=Machine)
+def invalidate_autocomplete_on_save(sender, instance, created, **kwargs):
+    """Stock postings save items constantly; only name or visibility changes invalidate typeahead"""
+    if created or instance.has_changed('name', 'deleted'):
+        bump_version_on_commit(version_name(sender))
+
+
+@receiver(post_delete, sender=InventoryItem)
+@receiver(post_delete, sender=Company)
+@receiver(post_delete, sender=Machine)
+def invalidate_autocomplete_on_delete(sender, instance, **kwargs):
+    bump_version_on_commit(version_name(sender))
+
+
+@receiver(post_save, sender=Quotation)
+def update_quotation_stats(sender, instance, created, **kwargs):
+    """Keep the monthly quotation rollup in step with status, total, date and company changes"""
+    analytics.record_change(instance, created)
+
+
+@receiver(post_delete, sender=Quotation)
+def remove_quotation_stats(sender, instance, **kwargs):
+    analytics.record_removal(instance)
+
+
+@receiver(post_save, sender=MachineRequirement)
+@receiver(post_delete, sender=MachineRequirement)
+def invalidate_bom(sender, instance, **kwargs):
+    """Drop the cached BOM matrix in every process after a requirement changes"""
+    invalidate_bom_matrix()
+
+
+@receiver(post_save, sender=MachineRequirement)
+def update_draft_demands_on_save(sender, instance, created, **kwargs):
+    """Apply only the change in requirements to draft demands; finalized demands are left as they are"""
+    demand_sync.record_change(instance, created)
+
+
+@receiver(post_delete, sender=MachineRequirement)
+def update_draft_demands_on_delete(sender, instance, **kwargs):
+    demand_sync.record_removal(instance)
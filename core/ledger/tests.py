@@ -1,3 +1,255 @@
+import datetime
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import bom
+from .bom import get_bom_matrix
+from .models import (
+    Batch, Company, Demand, DemandMachineOrder, DemandMaterial, DocumentSequence,
+    InventoryItem, Invoice, Machine, MachineRequirement, Quotation, QuotationItem
+)
+from .serializers import QuotationDetailSerializer
+
+
+class DemandSyncTests(TestCase):
+    """BOM edits applied as deltas must leave draft demands equal to a full re-explosion"""
+
+    def setUp(self):
+        # The matrix is cached per process; rolled-back version rows could match a stale one
+        bom._matrix = None
+        self.company = Company.objects.create(name='Acme')
+        self.steel, self.bolt, self.glue = [
+            InventoryItem.objects.create(name=name, unit_price=1) for name in ('steel', 'bolt', 'glue')
+        ]
+        self.motor, self.frame, self.press = [
+            Machine.objects.create(name=name) for name in ('motor', 'frame', 'press')
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.motor_steel = MachineRequirement.objects.create(machine=self.motor, inventory_item=self.steel, quantity=2)
+            self.motor_bolt = MachineRequirement.objects.create(machine=self.motor, inventory_item=self.bolt, quantity=4)
+            self.frame_motor = MachineRequirement.objects.create(machine=self.frame, component_machine=self.motor, quantity=2)
+            self.frame_steel = MachineRequirement.objects.create(machine=self.frame, inventory_item=self.steel, quantity=10)
+            self.press_frame = MachineRequirement.objects.create(machine=self.press, component_machine=self.frame, quantity=1)
+
+        self.drafts = [
+            self.make_demand([(self.press, 3), (self.motor, 1)]),
+            self.make_demand([(self.frame, 2)]),
+        ]
+        self.finalized = self.make_demand([(self.press, 1)], status='finalized')
+        self.finalized_materials = self.materials(self.finalized)
+
+    def make_demand(self, orders, status='draft'):
+        demand = Demand.objects.create(company=self.company, status=status)
+        DemandMachineOrder.objects.bulk_create([
+            DemandMachineOrder(demand=demand, machine=machine, quantity=quantity) for machine, quantity in orders
+        ])
+        DemandMaterial.objects.bulk_create([
+            DemandMaterial(demand=demand, inventory_item_id=item_id, quantity=quantity)
+            for item_id, quantity in get_bom_matrix().multiply((machine.pk, quantity) for machine, quantity in orders).items()
+        ])
+        return demand
+
+    def materials(self, demand):
+        return dict(DemandMaterial.objects.filter(demand=demand).values_list('inventory_item_id', 'quantity'))
+
+    def edit(self, requirement, **changes):
+        with self.captureOnCommitCallbacks(execute=True):
+            for field, value in changes.items():
+                setattr(requirement, field, value)
+            requirement.save()
+
+    def assertMatchesExplosion(self):
+        matrix = get_bom_matrix()
+        for demand in self.drafts:
+            orders = demand.machine_orders.values_list('machine_id', 'quantity')
+            expected = {
+                item_id: quantity.quantize(Decimal('0.0001'))
+                for item_id, quantity in matrix.multiply(orders).items() if quantity
+            }
+            self.assertEqual(self.materials(demand), expected)
+        self.assertEqual(self.materials(self.finalized), self.finalized_materials)
+
+    def test_quantity_change(self):
+        self.edit(self.motor_steel, quantity=Decimal('3'))
+        self.assertMatchesExplosion()
+
+    def test_item_swap(self):
+        self.edit(self.motor_bolt, inventory_item=self.glue)
+        self.assertMatchesExplosion()
+        self.assertFalse(DemandMaterial.objects.filter(demand__in=self.drafts, inventory_item=self.bolt).exists())
+
+    def test_component_line(self):
+        self.edit(self.press_frame, quantity=Decimal('2'))
+        self.assertMatchesExplosion()
+        with self.captureOnCommitCallbacks(execute=True):
+            MachineRequirement.objects.create(machine=self.press, component_machine=self.motor, quantity=1)
+        self.assertMatchesExplosion()
+
+    def test_move_to_another_machine(self):
+        self.edit(self.motor_bolt, machine=self.press, quantity=Decimal('3'))
+        self.assertMatchesExplosion()
+
+    def test_removal(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.frame_steel.delete()
+        self.assertMatchesExplosion()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.frame_motor.delete()
+        self.assertMatchesExplosion()
+
+    def test_finalized_demand_untouched(self):
+        self.edit(self.motor_steel, quantity=Decimal('7'))
+        self.edit(self.frame_steel, inventory_item=self.glue)
+        self.assertEqual(self.materials(self.finalized), self.finalized_materials)
+
+
+class DocumentSequenceTests(TestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name='Acme')
+        self.year = timezone.localdate().year
+
+    def test_reserve_block(self):
+        self.assertEqual(
+            DocumentSequence.reserve('INV', 3),
+            [f'INV-{self.year}-0001', f'INV-{self.year}-0002', f'INV-{self.year}-0003']
+        )
+        self.assertEqual(DocumentSequence.next_number('INV'), f'INV-{self.year}-0004')
+        self.assertEqual(DocumentSequence.next_number('INV', year=self.year + 1), f'INV-{self.year + 1}-0001')
+
+    def test_seeded_from_existing_numbers(self):
+        today = timezone.localdate()
+        Quotation.objects.create(company=self.company, quotation_number=f'QT-{self.year}-0041', quotation_date=today)
+        quotation = Quotation.objects.create(company=self.company, quotation_date=today)
+        self.assertEqual(quotation.quotation_number, f'QT-{self.year}-0042')
+
+    def test_documents_draw_from_counter(self):
+        DocumentSequence.reserve('INV', 2)
+        invoice = Invoice.objects.create(company=self.company, invoice_date=timezone.localdate(), amount=5)
+        self.assertEqual(invoice.invoice_number, f'INV-{self.year}-0003')
+
+
+class FefoTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'x'))
+        self.item = InventoryItem.objects.create(name='resin', unit_price=1)
+        today = timezone.localdate()
+        self.late = Batch.objects.create(item=self.item, batch_number='B1', expiry_date=today + datetime.timedelta(days=10), balance=5)
+        self.soon = Batch.objects.create(item=self.item, batch_number='B2', expiry_date=today + datetime.timedelta(days=5), balance=3)
+        self.undated = Batch.objects.create(item=self.item, batch_number='B3', balance=10)
+        Batch.objects.create(item=self.item, batch_number='B4', expiry_date=today, balance=0)
+
+    def fefo(self, quantity):
+        return self.client.get('/api/batches/fefo/', {'item': self.item.pk, 'quantity': quantity})
+
+    def test_picks_earliest_expiry_first(self):
+        response = self.fefo('6')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(pick['batch'], pick['pick_quantity']) for pick in response.data['picks']],
+            [(self.soon.pk, Decimal('3')), (self.late.pk, Decimal('3'))]
+        )
+        self.assertEqual(response.data['shortfall'], 0)
+
+    def test_undated_batches_last_and_shortfall(self):
+        response = self.fefo('20')
+        self.assertEqual([pick['batch'] for pick in response.data['picks']], [self.soon.pk, self.late.pk, self.undated.pk])
+        self.assertEqual(response.data['allocated'], Decimal('18'))
+        self.assertEqual(response.data['shortfall'], Decimal('2'))
+
+    def test_rejects_invalid_quantities(self):
+        for quantity in ('NaN', 'sNaN', 'Infinity', '-Infinity', '0', '-1', 'abc'):
+            with self.subTest(quantity=quantity):
+                self.assertEqual(self.fefo(quantity).status_code, 400)
+
+
+class QuotationItemsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'x'))
+        self.company = Company.objects.create(name='Acme')
+        self.today = str(timezone.localdate())
+
+    def line(self, **values):
+        # The quotation forms send id: null for every new line
+        return {'id': None, 'item_name': 'Part', 'quantity': '1', 'unit_price': '10', **values}
+
+    def create(self, items):
+        return self.client.post(
+            '/api/quotations/',
+            {'company': self.company.pk, 'quotation_date': self.today, 'items': items},
+            format='json'
+        )
+
+    def update(self, quotation_id, items):
+        return self.client.put(
+            f'/api/quotations/{quotation_id}/',
+            {'company': self.company.pk, 'quotation_date': self.today, 'items': items},
+            format='json'
+        )
+
+    def test_create_with_null_ids(self):
+        response = self.create([self.line(), self.line(item_name='Bolt', quantity='2')])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['items']), 2)
+        self.assertEqual(Decimal(response.data['subtotal']), Decimal('30.00'))
+
+    def test_create_ignores_item_quotation(self):
+        other = self.create([self.line()]).data['id']
+        response = self.create([self.line(quotation=other)])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(QuotationItem.objects.filter(quotation_id=response.data['id']).count(), 1)
+
+    def test_subtotal_sums_rounded_lines(self):
+        response = self.create([self.line(quantity='0.15', unit_price='0.15') for _ in range(3)])
+        self.assertEqual(Decimal(response.data['subtotal']), Decimal('0.06'))
+
+    def test_update_changes_adds_and_removes_lines(self):
+        created = self.create([self.line(item_name=f'Part {n}') for n in range(3)]).data
+        first, second, third = created['items']
+        response = self.update(created['id'], [
+            {'id': first['id'], 'item_name': first['item_name'], 'quantity': '4', 'unit_price': '10'},
+            {'id': second['id'], 'item_name': second['item_name'], 'quantity': '1', 'unit_price': '10'},
+            self.line(item_name='New'),
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Decimal(response.data['subtotal']), Decimal('60.00'))
+        self.assertEqual(
+            sorted(QuotationItem.objects.filter(quotation_id=created['id']).values_list('item_name', flat=True)),
+            ['New', 'Part 0', 'Part 1']
+        )
+        self.assertTrue(QuotationItem.all_objects.get(pk=third['id']).deleted)
+
+    def test_update_rejects_foreign_item(self):
+        other = self.create([self.line()]).data['items'][0]['id']
+        created = self.create([self.line()]).data
+        response = self.update(created['id'], [self.line(id=other)])
+        self.assertEqual(response.status_code, 400)
+
+    def test_sync_cost_does_not_grow_with_unchanged_lines(self):
+        item = InventoryItem.objects.create(name='Bolt', unit_price=10)
+
+        def save_one_change(line_count):
+            quotation = self.create([self.line(inventory_item=item.pk) for _ in range(line_count)]).data['id']
+            quotation = Quotation.objects.get(pk=quotation)
+            items = [
+                {'id': line.pk, 'item_name': line.item_name, 'inventory_item': item.pk,
+                 'quantity': line.quantity, 'unit_price': line.unit_price}
+                for line in quotation.items.all()
+            ]
+            items[0]['quantity'] = '3'
+            serializer = QuotationDetailSerializer(quotation, data={
+                'company': self.company.pk, 'quotation_date': self.today, 'items': items
+            })
+            serializer.is_valid(raise_exception=True)
+            with CaptureQueriesContext(connection) as queries:
+                serializer.save()
+            return len(queries)
 
-# Create your tests here.
+        self.assertEqual(save_one_change(3), save_one_change(12))
@@ -9,7 +9,7 @@ from .views import (
     UserViewSet, RoleViewSet, PermissionViewSet,
     TaxViewSet, InventoryItemViewSet, QuotationViewSet, QuotationItemViewSet,
     UnitViewSet, LocationViewSet, BatchViewSet, StockTransactionViewSet, ProjectViewSet,
-    MachineViewSet, MachineRequirementViewSet, DemandViewSet
+    MachineViewSet, MachineRequirementViewSet, DemandViewSet, PlannedOrderViewSet, AutocompleteViewSet
 )
 from .serializers import CustomTokenObtainPairSerializer
 
@@ -38,6 +38,8 @@ router.register(r'quotation-items', QuotationItemViewSet, basename='quotation-it
 router.register(r'machines', MachineViewSet, basename='machine')
 router.register(r'machine-requirements', MachineRequirementViewSet, basename='machine-requirement')
 router.register(r'demands', DemandViewSet, basename='demand')
+router.register(r'planned-orders', PlannedOrderViewSet, basename='planned-order')
+router.register(r'autocomplete', AutocompleteViewSet, basename='autocomplete')
 
 urlpatterns = [
     path('api/', include(router.urls)),
@@ -3,8 +3,16 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import DjangoModelPermissions, IsAuthenticated
 from .permissions import CustomDjangoModelPermissions
-from django.db.models import Sum
-from datetime import datetime
+from django.db.models import Sum, Count, Q, F, Window, Case, When, Value, DecimalField
+from django.db.models.functions import Coalesce, Greatest
+from django.db import transaction
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.utils.dateparse import parse_datetime
+from datetime import datetime, timedelta
 from decimal import Decimal
 
 from .serializers import (
@@ -15,16 +23,25 @@ from .serializers import (
     TaxSerializer, InventoryItemSerializer, QuotationSerializer,
     QuotationListSerializer, QuotationDetailSerializer, QuotationItemSerializer,
     UnitSerializer, LocationSerializer, BatchSerializer, StockTransactionSerializer, ProjectSerializer,
-    MachineSerializer, MachineRequirementSerializer, DemandSerializer, CreateDemandSerializer
+    MachineSerializer, MachineRequirementSerializer, DemandSerializer, CreateDemandSerializer,
+    SimulateDemandSerializer, PlannedOrderSerializer,
+    InvoiceConversionSerializer, BulkInvoiceConversionSerializer
 )
 from django.contrib.auth.models import User, Group, Permission
 from .models import (
     Company, Invoice, Payment, LedgerEntry, Tax, 
     InventoryItem, Quotation, QuotationItem,
     Unit, Location, Batch, StockTransaction, Project,
-    Machine, MachineRequirement, Demand, DemandMachineOrder, DemandMaterial
+    Machine, MachineRequirement, Demand, DemandMachineOrder, DemandMaterial, PlannedOrder
 )
 from .export_utils import export_ledger_pdf, export_ledger_excel
+from . import pdf_workers
+from .pdf_workers import RenderTimeout
+from .search import inventory_item_index, company_index
+from .autocomplete import AUTOCOMPLETE_SOURCES, autocomplete
+from .eager_loading import EagerLoadingMixin
+from .bom import BomCycleError, get_bom_matrix
+from .planning import run_mrp, simulate
 
 
 class AuditMixin:
@@ -36,16 +53,20 @@ class AuditMixin:
         serializer.save(updated_by=self.request.user)
 
 
-class CompanyViewSet(AuditMixin, viewsets.ModelViewSet):
+class CompanyViewSet(EagerLoadingMixin, AuditMixin, viewsets.ModelViewSet):
     """ViewSet for Company CRUD operations"""
     queryset = Company.objects.all()
     serializer_class = CompanySerializer
     permission_classes = [IsAuthenticated, CustomDjangoModelPermissions]
     pagination_class = None
 
+    def get_queryset(self):
+        # Balances as subqueries instead of two aggregate queries per company
+        return Company.with_balances(Company.objects.all())
+
     def list(self, request, *args, **kwargs):
         # Optional: further restrict list if needed, but permissions handle access
-        queryset = self.get_queryset()
+        queryset = self.filter_queryset(self.get_queryset())
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
@@ -53,13 +74,13 @@ class CompanyViewSet(AuditMixin, viewsets.ModelViewSet):
     def search(self, request):
         query = request.query_params.get('q', '')
         if query:
-            companies = Company.objects.filter(name__icontains=query)
+            companies = company_index.search(self.get_queryset(), query)
             serializer = self.get_serializer(companies, many=True)
             return Response(serializer.data)
         return Response([])
 
 
-class ProjectViewSet(AuditMixin, viewsets.ModelViewSet):
+class ProjectViewSet(EagerLoadingMixin, AuditMixin, viewsets.ModelViewSet):
     """ViewSet for Project/WorkOrder CRUD operations"""
     queryset = Project.objects.all()
     serializer_class = ProjectSerializer
@@ -78,7 +99,7 @@ class ProjectViewSet(AuditMixin, viewsets.ModelViewSet):
         return queryset
 
 
-class InvoiceViewSet(AuditMixin, viewsets.ModelViewSet):
+class InvoiceViewSet(EagerLoadingMixin, AuditMixin, viewsets.ModelViewSet):
     queryset = Invoice.objects.all()
     serializer_class = InvoiceSerializer
     permission_classes = [IsAuthenticated, CustomDjangoModelPermissions]
@@ -91,7 +112,7 @@ class InvoiceViewSet(AuditMixin, viewsets.ModelViewSet):
         return queryset
 
 
-class PaymentViewSet(AuditMixin, viewsets.ModelViewSet):
+class PaymentViewSet(EagerLoadingMixin, AuditMixin, viewsets.ModelViewSet):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
     permission_classes = [IsAuthenticated, CustomDjangoModelPermissions]
@@ -104,7 +125,7 @@ class PaymentViewSet(AuditMixin, viewsets.ModelViewSet):
         return queryset
 
 
-class LedgerViewSet(viewsets.ReadOnlyModelViewSet):
+class LedgerViewSet(EagerLoadingMixin, viewsets.ReadOnlyModelViewSet):
     queryset = LedgerEntry.objects.all()
     serializer_class = LedgerEntrySerializer
     permission_classes = [IsAuthenticated, CustomDjangoModelPermissions] # ReadOnly, so basically just need to be logged in
@@ -124,7 +145,8 @@ class LedgerViewSet(viewsets.ReadOnlyModelViewSet):
         except Company.DoesNotExist:
             return Response({'error': 'Company not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        entries = LedgerEntry.objects.filter(company=company).order_by('transaction_date', 'created_at')
+        entries = LedgerEntry.objects.filter(company=company).order_by('transaction_date', 'created_at')\
+            .select_related('invoice__company', 'payment__company')
 
         if start_date:
             try:
@@ -204,6 +226,8 @@ class LedgerViewSet(viewsets.ReadOnlyModelViewSet):
 
         try:
             return export_ledger_pdf(company, start_date, end_date)
+        except RenderTimeout as e:
+            return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -228,9 +252,10 @@ class LedgerViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def outstanding_balance(self, request):
         company_id = request.query_params.get('company', None)
+        companies = Company.with_balances(Company.objects.all())
         if company_id:
             try:
-                company = Company.objects.get(pk=company_id)
+                company = companies.get(pk=company_id)
                 return Response({
                     'company': CompanySerializer(company).data,
                     'outstanding_balance': str(company.outstanding_balance)
@@ -238,7 +263,6 @@ class LedgerViewSet(viewsets.ReadOnlyModelViewSet):
             except Company.DoesNotExist:
                 return Response({'error': 'Company not found'}, status=status.HTTP_404_NOT_FOUND)
         else:
-            companies = Company.objects.all()
             result = []
             for company in companies:
                 result.append({
@@ -247,27 +271,56 @@ class LedgerViewSet(viewsets.ReadOnlyModelViewSet):
                 })
             return Response(result)
 
-class UserViewSet(viewsets.ModelViewSet):
-    queryset = User.objects.all().order_by('id')
+class UserViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
+    # Roles and permissions are read through SerializerMethodFields, so prefetch them by hand
+    queryset = User.objects.all().order_by('id').prefetch_related('groups__permissions', 'user_permissions')
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated, CustomDjangoModelPermissions] # User management usually has its own checks or is admin-only. Let's keep strict checks.
     # Actually, for UserViewSet, we probably want IsAdminUser or custom permissions, but let's stick to IsAuthenticated for now as we have RBAC on top.
 
-class RoleViewSet(viewsets.ModelViewSet):
+class RoleViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Group.objects.all()
     serializer_class = RoleSerializer
     permission_classes = [IsAuthenticated, CustomDjangoModelPermissions]
 
-class PermissionViewSet(viewsets.ReadOnlyModelViewSet):
+class PermissionViewSet(EagerLoadingMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Permission.objects.all()
     serializer_class = PermissionSerializer
     permission_classes = [IsAuthenticated, CustomDjangoModelPermissions]
     pagination_class = None
 
 
+class AutocompleteViewSet(viewsets.ViewSet):
+    """
+    Typeahead over names: /api/autocomplete/?type=item|company|machine&q=<prefix>&limit=10
+    Served from a per-process prefix index; returns only ids and names.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def list(self, request):
+        source = request.query_params.get('type', None)
+        query = request.query_params.get('q', '')
+        if source not in AUTOCOMPLETE_SOURCES:
+            return Response(
+                {'error': f'type must be one of: {", ".join(AUTOCOMPLETE_SOURCES)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        model_name = AUTOCOMPLETE_SOURCES[source]._meta.model_name
+        if not request.user.has_perm(f'ledger.view_{model_name}'):
+            return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(autocomplete(source, query, limit))
+
+
 # --- Quotation Module ViewSets ---
 
-class TaxViewSet(AuditMixin, viewsets.ModelViewSet):
+class TaxViewSet(EagerLoadingMixin, AuditMixin, viewsets.ModelViewSet):
     """ViewSet for Tax CRUD operations"""
     queryset = Tax.objects.all()
     serializer_class = TaxSerializer
@@ -293,7 +346,7 @@ class TaxViewSet(AuditMixin, viewsets.ModelViewSet):
             return Response({'error': 'No default tax found'}, status=status.HTTP_404_NOT_FOUND)
 
 
-class InventoryItemViewSet(AuditMixin, viewsets.ModelViewSet):
+class InventoryItemViewSet(EagerLoadingMixin, AuditMixin, viewsets.ModelViewSet):
     """ViewSet for InventoryItem CRUD operations"""
     queryset = InventoryItem.objects.all()
     serializer_class = InventoryItemSerializer
@@ -307,10 +360,10 @@ class InventoryItemViewSet(AuditMixin, viewsets.ModelViewSet):
         if category:
             queryset = queryset.filter(category=category)
         
-        # Search by name
+        # Full-text search over name, SKU, description and category (ranked)
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(name__icontains=search)
+            queryset = inventory_item_index.search(queryset, search)
         
         return queryset
     
@@ -321,8 +374,55 @@ class InventoryItemViewSet(AuditMixin, viewsets.ModelViewSet):
         categories = [cat for cat in categories if cat]  # Filter out None/empty
         return Response(categories)
 
+    @action(detail=False, methods=['get'])
+    def low_stock(self, request):
+        """
+        Items at or below their reorder level (default) or minimum stock level (?level=min).
+        Pass ?since=<ISO datetime> to get only items whose reorder flag flipped after that time,
+        so alert badges can poll without pulling the whole catalogue. The minimum level keeps no
+        change time, so since with ?level=min is rejected with 400.
+        """
+        level = request.query_params.get('level', 'reorder')
+        since = request.query_params.get('since', None)
+        timestamp = timezone.now()
+
+        if level not in ('reorder', 'min'):
+            return Response({'error': 'level must be "reorder" or "min"'}, status=status.HTTP_400_BAD_REQUEST)
+
+        since_dt = None
+        if since:
+            since_dt = parse_datetime(since)
+            if since_dt is None:
+                return Response({'error': 'Invalid since format. Use ISO 8601'}, status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(since_dt):
+                since_dt = timezone.make_aware(since_dt)
+            # Only the reorder flag records when it last changed
+            if level == 'min':
+                return Response({'error': 'since is only supported with level=reorder'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if level == 'reorder':
+            if since_dt:
+                # Includes items that dropped off the list so the client can clear them
+                items = InventoryItem.objects.filter(reorder_status_changed_at__gt=since_dt)
+            else:
+                items = InventoryItem.objects.filter(below_reorder=True)
+        else:
+            items = InventoryItem.objects.filter(
+                min_stock_level__gt=0, stock_quantity__lte=F('min_stock_level')
+            )
+
+        results = list(items.values(
+            'id', 'name', 'sku', 'unit', 'stock_quantity', 'min_stock_level',
+            'reorder_level', 'below_reorder', 'reorder_status_changed_at'
+        ))
+        return Response({
+            'timestamp': timestamp.isoformat(),
+            'count': len(results),
+            'results': results,
+        })
 
-class UnitViewSet(AuditMixin, viewsets.ModelViewSet):
+
+class UnitViewSet(EagerLoadingMixin, AuditMixin, viewsets.ModelViewSet):
     """ViewSet for Unit CRUD operations"""
     queryset = Unit.objects.all()
     serializer_class = UnitSerializer
@@ -334,14 +434,41 @@ class UnitViewSet(AuditMixin, viewsets.ModelViewSet):
         return queryset
 
 
-class LocationViewSet(AuditMixin, viewsets.ModelViewSet):
+class LocationViewSet(EagerLoadingMixin, AuditMixin, viewsets.ModelViewSet):
     """ViewSet for Location CRUD operations"""
     queryset = Location.objects.all()
     serializer_class = LocationSerializer
     permission_classes = [IsAuthenticated, CustomDjangoModelPermissions]
 
+    @action(detail=True, methods=['get'])
+    def descendants(self, request, pk=None):
+        """All locations below this one (the whole subtree), in tree order"""
+        location = self.get_object()
+        include_self = request.query_params.get('include_self', 'false').lower() == 'true'
+        queryset = location.descendants(include_self=include_self).order_by('path')
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
 
-class BatchViewSet(AuditMixin, viewsets.ModelViewSet):
+    @action(detail=True, methods=['get'])
+    def stock(self, request, pk=None):
+        """Stock per item rolled up over this location and everything below it"""
+        location = self.get_object()
+        items = StockTransaction.objects.filter(Location.subtree_q(location.path, prefix='location__'))\
+            .values('item_id', 'item__name', 'item__unit')\
+            .annotate(quantity=Sum(Case(
+                When(transaction_type='issue', then=-F('base_quantity')),
+                default=F('base_quantity'),
+            )))\
+            .order_by('item__name')
+
+        return Response({
+            'location': location.id,
+            'location_name': str(location),
+            'items': list(items),
+        })
+
+
+class BatchViewSet(EagerLoadingMixin, AuditMixin, viewsets.ModelViewSet):
     """ViewSet for Batch CRUD operations"""
     queryset = Batch.objects.all()
     serializer_class = BatchSerializer
@@ -354,8 +481,76 @@ class BatchViewSet(AuditMixin, viewsets.ModelViewSet):
             queryset = queryset.filter(item_id=item_id)
         return queryset
 
+    @action(detail=False, methods=['get'])
+    def fefo(self, request):
+        """Suggest first-expired-first-out batch picks for issuing ?quantity= of ?item="""
+        item_id = request.query_params.get('item', None)
+        quantity = request.query_params.get('quantity', None)
+        if not item_id or not quantity:
+            return Response({'error': 'item and quantity parameters are required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            item_id = int(item_id)
+            quantity = Decimal(quantity)
+        except (ValueError, ArithmeticError):
+            return Response({'error': 'Invalid item or quantity'}, status=status.HTTP_400_BAD_REQUEST)
+        # NaN and Infinity parse as Decimals but are not quantities
+        if not quantity.is_finite() or quantity <= 0:
+            return Response({'error': 'quantity must be a positive number'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Running total in expiry order; keep batches until the requested quantity is covered.
+        # Served from batch_fefo_idx (item, expiry_date) over live batches with stock.
+        fefo_order = [F('expiry_date').asc(nulls_last=True), 'id']
+        batches = Batch.objects.filter(item_id=item_id, balance__gt=0).annotate(
+            running_total=Window(Sum('balance'), order_by=fefo_order)
+        ).filter(
+            running_total__lt=quantity + F('balance')
+        ).order_by(*fefo_order).values('id', 'batch_number', 'expiry_date', 'balance')
+
+        picks = []
+        remaining = quantity
+        for batch in batches:
+            pick_quantity = min(batch['balance'], remaining)
+            remaining -= pick_quantity
+            picks.append({
+                'batch': batch['id'],
+                'batch_number': batch['batch_number'],
+                'expiry_date': batch['expiry_date'],
+                'available': batch['balance'],
+                'pick_quantity': pick_quantity,
+            })
+
+        return Response({
+            'item': item_id,
+            'requested': quantity,
+            'allocated': quantity - remaining,
+            'shortfall': remaining,
+            'picks': picks,
+        })
 
-class StockTransactionViewSet(AuditMixin, viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'])
+    def expiring(self, request):
+        """Batches with stock expiring within ?days= (default 30) across all items, soonest first"""
+        try:
+            days = int(request.query_params.get('days', 30))
+        except ValueError:
+            return Response({'error': 'days must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        today = timezone.localdate()
+        batches = Batch.objects.filter(
+            balance__gt=0, expiry_date__lte=today + timedelta(days=days)
+        ).order_by('expiry_date', 'id').values(
+            'id', 'batch_number', 'expiry_date', 'balance',
+            'item_id', 'item__name', 'item__unit'
+        )
+
+        results = []
+        for batch in batches:
+            batch['days_to_expiry'] = (batch['expiry_date'] - today).days
+            results.append(batch)
+        return Response(results)
+
+
+class StockTransactionViewSet(EagerLoadingMixin, AuditMixin, viewsets.ModelViewSet):
     """ViewSet for StockTransaction CRUD operations"""
     queryset = StockTransaction.objects.all()
     serializer_class = StockTransactionSerializer
@@ -375,7 +570,7 @@ class StockTransactionViewSet(AuditMixin, viewsets.ModelViewSet):
 
 
 
-class QuotationViewSet(AuditMixin, viewsets.ModelViewSet):
+class QuotationViewSet(EagerLoadingMixin, AuditMixin, viewsets.ModelViewSet):
     """ViewSet for Quotation CRUD operations"""
     queryset = Quotation.objects.all()
     permission_classes = [IsAuthenticated, CustomDjangoModelPermissions]
@@ -417,6 +612,11 @@ class QuotationViewSet(AuditMixin, viewsets.ModelViewSet):
             except ValueError:
                 pass
         
+        if self.action == 'list':
+            # Meta.ordering is not applied to GROUP BY queries, so restore it explicitly
+            queryset = queryset.annotate(item_count=Count('items', filter=Q(items__deleted=False)))\
+                .order_by(*Quotation._meta.ordering)
+        
         return queryset
     
     @action(detail=True, methods=['get'])
@@ -425,11 +625,159 @@ class QuotationViewSet(AuditMixin, viewsets.ModelViewSet):
         quotation = self.get_object()
         
         try:
-            from .quotation_pdf import generate_quotation_pdf
-            return generate_quotation_pdf(quotation)
+            from . import pdf_cache
+            version, last_modified = pdf_cache.content_version(quotation)
+            etag = quote_etag(version)
+            last_modified = int(last_modified.timestamp())
+            
+            # Let the browser reuse its copy when nothing has changed
+            not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if not_modified is not None:
+                return not_modified
+            
+            response = FileResponse(
+                pdf_cache.open_pdf(quotation, version),
+                as_attachment=True,
+                filename=f'quotation_{quotation.quotation_number}.pdf',
+                content_type='application/pdf'
+            )
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            return response
+        except RenderTimeout as e:
+            return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+    @action(detail=False, methods=['get'])
+    def batch_pdf(self, request):
+        """
+        Render several quotations at once: ?ids=1,2,3 or the list filters.
+        ?output=zip returns one PDF per quotation in a ZIP, otherwise a single merged PDF.
+        """
+        queryset = self.get_queryset()
+        
+        ids = request.query_params.get('ids')
+        if ids:
+            try:
+                id_list = [int(pk) for pk in ids.split(',') if pk.strip()]
+            except ValueError:
+                return Response({'error': 'ids must be a comma separated list of integers'}, status=status.HTTP_400_BAD_REQUEST)
+            queryset = queryset.filter(pk__in=id_list)
+        
+        output = request.query_params.get('output', 'pdf')
+        if output not in ('pdf', 'zip'):
+            return Response({'error': 'output must be pdf or zip'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        limit = getattr(settings, 'QUOTATION_PDF_BATCH_LIMIT', 100)
+        quotations = list(
+            queryset.select_related('company').prefetch_related('items').order_by('quotation_date', 'id')[:limit + 1]
+        )
+        if not quotations:
+            return Response({'error': 'No quotations found'}, status=status.HTTP_404_NOT_FOUND)
+        if len(quotations) > limit:
+            return Response({'error': f'At most {limit} quotations can be rendered at once'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            from .quotation_pdf import quotation_snapshot, render_merged_pdf, render_zip
+            snapshots = [quotation_snapshot(quotation) for quotation in quotations]
+            stamp = timezone.now().strftime('%Y%m%d_%H%M%S')
+            if output == 'zip':
+                response = HttpResponse(render_zip(snapshots), content_type='application/zip')
+                response['Content-Disposition'] = f'attachment; filename="quotations_{stamp}.zip"'
+            else:
+                pdf = pdf_workers.render(render_merged_pdf, snapshots)
+                response = HttpResponse(pdf, content_type='application/pdf')
+                response['Content-Disposition'] = f'attachment; filename="quotations_{stamp}.pdf"'
+            return response
+        except RenderTimeout as e:
+            return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    @action(detail=False, methods=['get'])
+    def analytics(self, request):
+        """
+        Pipeline figures from the monthly rollup: value by month and status, acceptance rate, top customers.
+        Optional ?start=YYYY-MM&end=YYYY-MM&company=<id>&top=<n>; ?live=true computes from the quotations.
+        """
+        months = {}
+        for param in ('start', 'end'):
+            value = request.query_params.get(param)
+            if value:
+                try:
+                    months[param] = datetime.strptime(value, '%Y-%m').date()
+                except ValueError:
+                    return Response({'error': f'{param} must be YYYY-MM'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            top = min(int(request.query_params.get('top', 10)), 100)
+        except ValueError:
+            return Response({'error': 'top must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        from .analytics import pipeline
+        return Response(pipeline(
+            start_month=months.get('start'),
+            end_month=months.get('end'),
+            company_id=request.query_params.get('company'),
+            top=top,
+            live=request.query_params.get('live') == 'true',
+        ))
+    
+    @action(detail=True, methods=['post'])
+    def convert_to_invoice(self, request, pk=None):
+        """Create an invoice (and its ledger entry) from an accepted quotation"""
+        if not request.user.has_perm('ledger.add_invoice'):
+            return Response({'error': 'You do not have permission to create invoices'}, status=status.HTTP_403_FORBIDDEN)
+        
+        quotation = self.get_object()
+        params = InvoiceConversionSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        
+        invoices, skipped = Quotation.convert_to_invoices(
+            [quotation], request.user, params.validated_data.get('invoice_date')
+        )
+        if not invoices:
+            return Response({'error': skipped[0][1]}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(InvoiceSerializer(invoices[0]).data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=False, methods=['post'])
+    def bulk_convert_to_invoice(self, request):
+        """
+        Convert many accepted quotations to invoices in one transaction.
+        Takes {"ids": [...]}, or converts every accepted, uninvoiced quotation matching the list filters.
+        """
+        if not request.user.has_perm('ledger.add_invoice'):
+            return Response({'error': 'You do not have permission to create invoices'}, status=status.HTTP_403_FORBIDDEN)
+        
+        params = BulkInvoiceConversionSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        
+        queryset = self.get_queryset()
+        if 'ids' in params.validated_data:
+            queryset = queryset.filter(pk__in=params.validated_data['ids'])
+        else:
+            queryset = queryset.filter(status='accepted', invoice__isnull=True)
+        
+        invoices, skipped = Quotation.convert_to_invoices(
+            list(queryset.only('pk')), request.user, params.validated_data.get('invoice_date')
+        )
+        
+        return Response({
+            'created': [
+                {
+                    'id': invoice.quotation.pk, 'quotation_number': invoice.quotation.quotation_number,
+                    'invoice_id': invoice.pk, 'invoice_number': invoice.invoice_number, 'amount': str(invoice.amount)
+                }
+                for invoice in invoices
+            ],
+            'skipped': [
+                {'id': quotation.pk, 'quotation_number': quotation.quotation_number, 'reason': reason}
+                for quotation, reason in skipped
+            ],
+        }, status=status.HTTP_201_CREATED if invoices else status.HTTP_200_OK)
+    
     @action(detail=True, methods=['post'])
     def change_status(self, request, pk=None):
         """Change quotation status"""
@@ -442,14 +790,20 @@ class QuotationViewSet(AuditMixin, viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        previous_status = quotation.status
         quotation.status = new_status
         quotation.save()
         
+        if new_status == 'sent' and previous_status != 'sent':
+            # Sent quotations are about to be downloaded; render the PDF once the change is committed
+            from .pdf_cache import prerender_in_background
+            transaction.on_commit(lambda: prerender_in_background(quotation.pk))
+        
         serializer = self.get_serializer(quotation)
         return Response(serializer.data)
 
 
-class QuotationItemViewSet(AuditMixin, viewsets.ModelViewSet):
+class QuotationItemViewSet(EagerLoadingMixin, AuditMixin, viewsets.ModelViewSet):
     """ViewSet for QuotationItem CRUD operations"""
     queryset = QuotationItem.objects.all()
     serializer_class = QuotationItemSerializer
@@ -470,13 +824,13 @@ class QuotationItemViewSet(AuditMixin, viewsets.ModelViewSet):
 
 # --- Automated Demand & Aggregation ViewSets ---
 
-class MachineViewSet(AuditMixin, viewsets.ModelViewSet):
+class MachineViewSet(EagerLoadingMixin, AuditMixin, viewsets.ModelViewSet):
     """ViewSet for Machine CRUD operations"""
     queryset = Machine.objects.all()
     serializer_class = MachineSerializer
     permission_classes = [IsAuthenticated, CustomDjangoModelPermissions]
 
-class MachineRequirementViewSet(viewsets.ModelViewSet):
+class MachineRequirementViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     """ViewSet for Machine BOM CRUD operations"""
     queryset = MachineRequirement.objects.all()
     serializer_class = MachineRequirementSerializer
@@ -489,7 +843,7 @@ class MachineRequirementViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(machine_id=machine_id)
         return queryset
 
-class DemandViewSet(AuditMixin, viewsets.ModelViewSet):
+class DemandViewSet(EagerLoadingMixin, AuditMixin, viewsets.ModelViewSet):
     """ViewSet for Demand Generation and Aggregation"""
     queryset = Demand.objects.all()
     permission_classes = [IsAuthenticated, CustomDjangoModelPermissions]
@@ -499,18 +853,27 @@ class DemandViewSet(AuditMixin, viewsets.ModelViewSet):
             return CreateDemandSerializer
         return DemandSerializer
 
-    @action(detail=False, methods=['post'])
-    def aggregate(self, request):
-        """Aggregate materials for multiple demand sheets"""
+    def demand_ids_param(self, request):
         demand_ids = request.data.get('demand_ids', [])
         if not demand_ids:
-            return Response({'error': 'No demand IDs provided'}, status=status.HTTP_400_BAD_REQUEST)
-        
+            raise ValueError('No demand IDs provided')
+
         # Ensure integers
         try:
-            demand_ids = [int(x) for x in demand_ids]
+            return [int(x) for x in demand_ids]
         except (ValueError, TypeError):
-             return Response({'error': 'Invalid demand IDs'}, status=status.HTTP_400_BAD_REQUEST)
+            raise ValueError('Invalid demand IDs')
+
+    @action(detail=False, methods=['post'])
+    def aggregate(self, request):
+        """Aggregate materials for multiple demand sheets"""
+        try:
+            demand_ids = self.demand_ids_param(request)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.query_params.get('explode', '').lower() == 'true':
+            return self.explode_orders(demand_ids)
 
         # Aggregate materials
         # Optimization: Filter by indexed demand_id, group by inventory_item_id (indexed FK)
@@ -521,3 +884,94 @@ class DemandViewSet(AuditMixin, viewsets.ModelViewSet):
         
         # Force evaluation to list to resolve query before serialization overhead
         return Response(list(materials))
+
+    def explode_orders(self, demand_ids):
+        """Materials for the demands' machine orders, exploded through the current multi-level BOMs"""
+        orders = DemandMachineOrder.objects.filter(demand_id__in=demand_ids)\
+            .values_list('machine_id')\
+            .annotate(total_quantity=Sum('quantity'))\
+            .order_by()
+        try:
+            totals = get_bom_matrix().multiply(orders)
+        except BomCycleError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        items = InventoryItem.all_objects.filter(pk__in=list(totals)).values('id', 'name', 'unit')
+        materials = [
+            {
+                'inventory_item__id': item['id'],
+                'inventory_item__name': item['name'],
+                'inventory_item__unit': item['unit'],
+                'total_quantity': totals[item['id']].quantize(Decimal('0.0001')),
+            }
+            for item in items
+        ]
+        materials.sort(key=lambda row: row['inventory_item__name'])
+        return Response(materials)
+
+    @action(detail=False, methods=['post'])
+    def shortages(self, request):
+        """
+        Net requirements of the selected demands against stock on hand.
+        Reserved is what other finalized demands need of the same items; it is served first.
+        """
+        try:
+            demand_ids = self.demand_ids_param(request)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        quantity = DecimalField(max_digits=19, decimal_places=4)
+        selected = Q(demand_id__in=demand_ids)
+
+        # One grouped statement over the materials, joined to the items for stock
+        rows = DemandMaterial.objects.filter(selected | Q(demand__status='finalized', demand__deleted=False))\
+            .values('inventory_item__id', 'inventory_item__name', 'inventory_item__unit')\
+            .annotate(
+                gross_requirement=Coalesce(Sum('quantity', filter=selected), Value(0), output_field=quantity),
+                reserved=Coalesce(Sum('quantity', filter=~selected), Value(0), output_field=quantity),
+                on_hand=F('inventory_item__stock_quantity'),
+            )\
+            .filter(gross_requirement__gt=0)\
+            .annotate(shortfall=Greatest(
+                F('gross_requirement') + F('reserved') - F('on_hand'), Value(0), output_field=quantity
+            ))\
+            .order_by('inventory_item__name')
+
+        if request.query_params.get('only_short') == 'true':
+            rows = rows.filter(shortfall__gt=0)
+        return Response(list(rows))
+
+    @action(detail=False, methods=['post'])
+    def simulate(self, request):
+        """What-if explosion of machine orders against stock and prices; nothing is saved"""
+        serializer = SimulateDemandSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            return Response(simulate(serializer.validated_data['machine_orders']))
+        except BomCycleError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+class PlannedOrderViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
+    """ViewSet for MRP planned orders; release an order to count it as an open receipt"""
+    queryset = PlannedOrder.objects.all()
+    serializer_class = PlannedOrderSerializer
+    permission_classes = [IsAuthenticated, CustomDjangoModelPermissions]
+
+    def get_queryset(self):
+        queryset = PlannedOrder.objects.all()
+        status_param = self.request.query_params.get('status', None)
+        if status_param:
+            queryset = queryset.filter(status=status_param)
+        item_id = self.request.query_params.get('inventory_item', None)
+        if item_id:
+            queryset = queryset.filter(inventory_item_id=item_id)
+        return queryset
+
+    @action(detail=False, methods=['post'])
+    def run(self, request):
+        """Plan all open demands, replacing the current planned orders"""
+        try:
+            today = datetime.strptime(request.data['date'], '%Y-%m-%d').date() if request.data.get('date') else None
+        except ValueError:
+            return Response({'error': 'date must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(run_mrp(today))